@@ -106,3 +106,90 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
+
+AEGIS_STREAM_RESPONSES = os.getenv('AEGIS_STREAM_RESPONSES', 'False').lower() == 'true'
+
+AEGIS_MAX_TOOL_ROUNDS = int(os.getenv('AEGIS_MAX_TOOL_ROUNDS', '3'))
+AEGIS_TOOL_TIMEOUT = float(os.getenv('AEGIS_TOOL_TIMEOUT', '10'))
+AEGIS_SLOW_TURN_MS = float(os.getenv('AEGIS_SLOW_TURN_MS', '2000'))
+AEGIS_WS_COMPRESS_THRESHOLD = int(os.getenv('AEGIS_WS_COMPRESS_THRESHOLD', '1024'))
+AEGIS_WS_MAX_FRAME_BYTES = int(os.getenv('AEGIS_WS_MAX_FRAME_BYTES', str(4 * 1024 * 1024)))
+
+# Camera frames: at most AEGIS_MEDIA_MAX_FPS frames per session reach the model,
+# and only when they differ from the last one by more than AEGIS_MEDIA_HASH_DISTANCE
+# of the 64 perceptual-hash bits.
+AEGIS_MEDIA_MAX_FPS = float(os.getenv('AEGIS_MEDIA_MAX_FPS', '0.5'))
+AEGIS_MEDIA_HASH_DISTANCE = int(os.getenv('AEGIS_MEDIA_HASH_DISTANCE', '6'))
+AEGIS_MEDIA_MAX_SIDE = int(os.getenv('AEGIS_MEDIA_MAX_SIDE', '512'))
+AEGIS_MEDIA_FRAME_PROMPT = os.getenv(
+    'AEGIS_MEDIA_FRAME_PROMPT',
+    'New camera frame from stream {stream_id}. Audit it for safety deviations.'
+)
+
+# Audio: 16-bit PCM chunks are gated by an energy VAD; only voiced segments of at
+# most AEGIS_AUDIO_MAX_SEGMENT_SECONDS reach the model.
+AEGIS_AUDIO_SAMPLE_RATE = int(os.getenv('AEGIS_AUDIO_SAMPLE_RATE', '16000'))
+AEGIS_AUDIO_VAD_THRESHOLD_DB = float(os.getenv('AEGIS_AUDIO_VAD_THRESHOLD_DB', '-45'))
+AEGIS_AUDIO_HANGOVER_MS = int(os.getenv('AEGIS_AUDIO_HANGOVER_MS', '400'))
+AEGIS_AUDIO_MAX_SEGMENT_SECONDS = float(os.getenv('AEGIS_AUDIO_MAX_SEGMENT_SECONDS', '15'))
+AEGIS_AUDIO_MAX_STREAMS = int(os.getenv('AEGIS_AUDIO_MAX_STREAMS', '4'))
+AEGIS_AUDIO_SEGMENT_PROMPT = os.getenv(
+    'AEGIS_AUDIO_SEGMENT_PROMPT',
+    'Audio segment from stream {stream_id}. Audit what is said for safety deviations.'
+)
+
+# Per-session coalescing of bursty text messages (AEGIS_BATCH_WINDOW_MS=0 disables it).
+# Messages containing an urgent keyword skip the window.
+AEGIS_BATCH_WINDOW_MS = float(os.getenv('AEGIS_BATCH_WINDOW_MS', '0'))
+AEGIS_BATCH_MAX_MESSAGES = int(os.getenv('AEGIS_BATCH_MAX_MESSAGES', '10'))
+AEGIS_BATCH_MAX_DELAY_MS = float(os.getenv('AEGIS_BATCH_MAX_DELAY_MS', '1000'))
+AEGIS_URGENT_KEYWORDS = [
+    keyword for keyword in os.getenv(
+        'AEGIS_URGENT_KEYWORDS', 'critical,emergency,code blue,cardiac arrest,hemorrhage,fire'
+    ).split(',') if keyword.strip()
+]
+
+# Opt-in cache of turn results for repeated inputs, keyed on the normalized input
+# and the model/rules configuration (not the conversation so far). Turns that logged
+# a deviation are never cached. AEGIS_RESPONSE_CACHE_SCOPE is "session" or "global".
+AEGIS_RESPONSE_CACHE = os.getenv('AEGIS_RESPONSE_CACHE', 'False').lower() == 'true'
+AEGIS_RESPONSE_CACHE_SIZE = int(os.getenv('AEGIS_RESPONSE_CACHE_SIZE', '1024'))
+AEGIS_RESPONSE_CACHE_TTL = float(os.getenv('AEGIS_RESPONSE_CACHE_TTL', '300'))
+AEGIS_RESPONSE_CACHE_SCOPE = os.getenv('AEGIS_RESPONSE_CACHE_SCOPE', 'session')
+
+# Resumable sessions: compacted orchestrator state is snapshotted after every turn to
+# "db" (SessionSnapshot table) or "file" (AEGIS_SESSION_DIR); empty disables resume.
+AEGIS_SESSION_STORE = os.getenv('AEGIS_SESSION_STORE', 'db')
+AEGIS_SESSION_DIR = os.getenv('AEGIS_SESSION_DIR', str(BASE_DIR / 'session_snapshots'))
+AEGIS_SESSION_TTL = float(os.getenv('AEGIS_SESSION_TTL', '86400'))
+
+AEGIS_HISTORY_MAX_TURNS = int(os.getenv('AEGIS_HISTORY_MAX_TURNS', '20'))
+AEGIS_HISTORY_TOKEN_BUDGET = int(os.getenv('AEGIS_HISTORY_TOKEN_BUDGET', '8000'))
+AEGIS_HISTORY_SUMMARY_CHARS = int(os.getenv('AEGIS_HISTORY_SUMMARY_CHARS', '2000'))
+
+AEGIS_DEVIATION_BATCH_SIZE = int(os.getenv('AEGIS_DEVIATION_BATCH_SIZE', '100'))
+AEGIS_DEVIATION_FLUSH_INTERVAL = float(os.getenv('AEGIS_DEVIATION_FLUSH_INTERVAL', '0.05'))
+
+BIGQUERY_PROJECT_ID = os.getenv('BIGQUERY_PROJECT_ID', '')
+BIGQUERY_DATASET = os.getenv('BIGQUERY_DATASET', 'aegis')
+
+ANALYTICS_SINK = os.getenv('ANALYTICS_SINK', 'bigquery')
+ANALYTICS_SINK_DIR = os.getenv('ANALYTICS_SINK_DIR', str(BASE_DIR / 'analytics_export'))
+ANALYTICS_SPILL_PATH = os.getenv('ANALYTICS_SPILL_PATH', str(BASE_DIR / 'analytics_spill.ndjson'))
+ANALYTICS_QUEUE_MAX_ROWS = int(os.getenv('ANALYTICS_QUEUE_MAX_ROWS', '10000'))
+ANALYTICS_BATCH_ROWS = int(os.getenv('ANALYTICS_BATCH_ROWS', '500'))
+ANALYTICS_BATCH_BYTES = int(os.getenv('ANALYTICS_BATCH_BYTES', '1000000'))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', '1.0'))
+ANALYTICS_MAX_RETRIES = int(os.getenv('ANALYTICS_MAX_RETRIES', '3'))
+ANALYTICS_SPILL_REPLAY_INTERVAL = float(os.getenv('ANALYTICS_SPILL_REPLAY_INTERVAL', '30'))
+
+KNOWLEDGE_VAULT_DIR = os.getenv('KNOWLEDGE_VAULT_DIR', str(BASE_DIR / 'knowledge_vault' / 'documents'))
+KNOWLEDGE_VAULT_INDEX = os.getenv('KNOWLEDGE_VAULT_INDEX', str(BASE_DIR / 'knowledge_vault.idx'))
+KNOWLEDGE_VAULT_TOP_K = int(os.getenv('KNOWLEDGE_VAULT_TOP_K', '3'))
+KNOWLEDGE_VAULT_SEARCH_MODE = os.getenv('KNOWLEDGE_VAULT_SEARCH_MODE', 'lexical')
+KNOWLEDGE_VAULT_CACHE_SIZE = int(os.getenv('KNOWLEDGE_VAULT_CACHE_SIZE', '256'))
+KNOWLEDGE_VAULT_CACHE_TTL = float(os.getenv('KNOWLEDGE_VAULT_CACHE_TTL', '300'))
+
+AEGIS_RULES_PATH = os.getenv('AEGIS_RULES_PATH', str(BASE_DIR / 'core_auditor' / 'rules.json'))
+# Opt-in: rule matches ignore negation, so pre-screened deviations can be false positives.
+AEGIS_PRESCREEN_MIN_SEVERITY = os.getenv('AEGIS_PRESCREEN_MIN_SEVERITY', '')
@@ -19,5 +19,6 @@ from django.urls import path, include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/analytics/', include('analytics.urls')),
     path('', include('core_auditor.urls')),
 ]
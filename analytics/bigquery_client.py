@@ -2,12 +2,22 @@ import logging
 import json
 from datetime import datetime
 
+from django.conf import settings
+
 logger = logging.getLogger(__name__)
 
 class BigQueryClient:
     def __init__(self):
-        # In production, initialize google.cloud.bigquery.Client
-        self.mock_mode = True 
+        self.project_id = settings.BIGQUERY_PROJECT_ID
+        self.mock_mode = not self.project_id
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google.cloud import bigquery
+            self._client = bigquery.Client(project=self.project_id)
+        return self._client
 
     async def stream_row(self, dataset_id, table_id, row_data):
         """
@@ -16,9 +26,19 @@ class BigQueryClient:
         if self.mock_mode:
             logger.info(f"[BigQuery] Streaming to {dataset_id}.{table_id}: {json.dumps(row_data)}")
             return True
-        
-        # Real implementation would go here
-        pass
+
+        return not self.insert_rows(dataset_id, table_id, [row_data])
+
+    def insert_rows(self, dataset_id, table_id, rows):
+        """
+        Streams a batch of rows in one insert call. Returns the list of
+        per-row errors reported by BigQuery (empty on success).
+        """
+        if self.mock_mode:
+            logger.info(f"[BigQuery] Streaming {len(rows)} rows to {dataset_id}.{table_id}")
+            return []
+
+        return self.client.insert_rows_json(f"{self.project_id}.{dataset_id}.{table_id}", rows)
 
 # Singleton instance
 bq_client = BigQueryClient()
@@ -0,0 +1,107 @@
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+class DeviationWriter:
+    """
+    Write-behind buffer for Deviation rows.
+
+    Callers from every session enqueue rows and wait on a future; a single
+    background thread commits them with bulk_create once the buffer reaches
+    `batch_size` or `flush_interval` seconds have passed, so a storm of
+    deviations costs one transaction per batch instead of one per row.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or settings.AEGIS_DEVIATION_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.AEGIS_DEVIATION_FLUSH_INTERVAL
+        self._buffer = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, **fields):
+        """
+        Queues a deviation and returns a Future resolving to the saved row.
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Deviation writer is closed")
+            self._ensure_thread()
+            self._buffer.append((fields, future))
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return future
+
+    def write(self, timeout=None, **fields):
+        return self.submit(**fields).result(timeout=timeout)
+
+    async def awrite(self, **fields):
+        return await asyncio.wrap_future(self.submit(**fields))
+
+    def flush(self):
+        with self._condition:
+            batch, self._buffer = self._buffer, []
+        self._commit(batch)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=max(self.flush_interval * 10, 1.0))
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="deviation-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._condition.wait(timeout=self.flush_interval)
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                closed = self._closed
+            self._commit(batch)
+            if closed:
+                break
+        close_old_connections()
+
+    def _commit(self, batch):
+        if not batch:
+            return
+
+        from .models import Deviation
+        from .rollups import apply_rollups
+
+        try:
+            with transaction.atomic():
+                rows = Deviation.objects.bulk_create(
+                    [Deviation(**fields) for fields, _ in batch]
+                )
+                apply_rollups(rows)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} deviations: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        logger.debug(f"Flushed {len(rows)} deviations")
+        for row, (_, future) in zip(rows, batch):
+            future.set_result(row)
+
+# Singleton instance
+deviation_writer = DeviationWriter()
+atexit.register(deviation_writer.close)
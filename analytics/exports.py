@@ -0,0 +1,66 @@
+import csv
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import Deviation
+
+EXPORT_FIELDS = ['id', 'timestamp', 'severity', 'description', 'recommended_action', 'session_id']
+EXPORT_CHUNK_SIZE = 2000
+
+def deviation_export_queryset(start=None, end=None, severity=None, session_id=None):
+    """
+    Deviations matching the export filters, oldest first, as value tuples
+    in EXPORT_FIELDS order.
+    """
+    queryset = Deviation.objects.all()
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    if severity:
+        queryset = queryset.filter(severity=severity.upper())
+    if session_id:
+        queryset = queryset.filter(session_id=session_id)
+    return queryset.order_by('timestamp', 'id').values_list(*EXPORT_FIELDS)
+
+def _rows(queryset, chunk_size):
+    # Server-side cursor: only one chunk of rows is held in memory at a time.
+    return queryset.iterator(chunk_size=chunk_size)
+
+def ndjson_lines(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in _rows(queryset, chunk_size):
+        record = dict(zip(EXPORT_FIELDS, row))
+        record['timestamp'] = record['timestamp'].isoformat()
+        yield json.dumps(record) + "\n"
+
+class _Echo:
+    def write(self, value):
+        return value
+
+def csv_lines(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _rows(queryset, chunk_size):
+        yield writer.writerow(row[:1] + (row[1].isoformat(),) + row[2:])
+
+async def aiter_lines(lines, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Async form of an export generator for ASGI responses. Django would
+    otherwise drain a sync iterator into a list before sending anything;
+    here each chunk of lines is produced on the request's database thread
+    and sent as soon as it is ready.
+    """
+    generator = lines(queryset, chunk_size)
+    next_chunk = sync_to_async(lambda: "".join(itertools.islice(generator, chunk_size)))
+    while True:
+        chunk = await next_chunk()
+        if not chunk:
+            return
+        yield chunk
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+    'csv': ('text/csv', csv_lines),
+}
@@ -0,0 +1,86 @@
+import base64
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Deviation
+
+logger = logging.getLogger(__name__)
+
+DEVIATION_GROUP = "deviations"
+
+def encode_cursor(deviation):
+    raw = f"{deviation.timestamp.isoformat()}|{deviation.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """
+    Returns the (timestamp, id) keyset position encoded in `cursor`.
+    Raises ValueError for malformed cursors.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, pk = raw.rsplit('|', 1)
+        parsed = parse_datetime(timestamp)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if parsed is None:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return parsed, pk
+
+def deviation_payload(deviation):
+    # DRF is only needed once a deviation is actually sent; keep it off the
+    # consumer import path.
+    from .serializers import DeviationSerializer
+
+    payload = dict(DeviationSerializer(deviation).data)
+    payload['cursor'] = encode_cursor(deviation)
+    return payload
+
+def deviations_after(cursor=None, start=None, limit=100):
+    """
+    Keyset page of deviations ordered by (timestamp, id), strictly after
+    `cursor` or, without one, from `start`. Returns (deviations,
+    next_cursor, has_more); seeks on deviation_timestamp_idx, so the cost
+    does not grow with how far into the history the page is.
+    """
+    queryset = Deviation.objects.order_by('timestamp', 'id')
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+    elif start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+
+    page = list(queryset[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_cursor = encode_cursor(page[-1]) if page else cursor
+    return page, next_cursor, has_more
+
+def _event(deviation):
+    return {"type": "deviation.created", "deviation": deviation_payload(deviation)}
+
+async def abroadcast_deviation(deviation):
+    """
+    Pushes a newly written deviation to every connected dashboard.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        await channel_layer.group_send(DEVIATION_GROUP, _event(deviation))
+    except Exception as e:
+        logger.warning(f"Failed to broadcast deviation {deviation.id}: {e}")
+
+def broadcast_deviation(deviation):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(DEVIATION_GROUP, _event(deviation))
+    except Exception as e:
+        logger.warning(f"Failed to broadcast deviation {deviation.id}: {e}")
@@ -0,0 +1,54 @@
+import sys
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytics.exports import EXPORT_FORMATS, deviation_export_queryset
+
+class Command(BaseCommand):
+    help = "Streams deviations to a file or stdout as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--start', help="ISO 8601 lower bound (inclusive)")
+        parser.add_argument('--end', help="ISO 8601 upper bound (exclusive)")
+        parser.add_argument('--severity')
+        parser.add_argument('--session')
+        parser.add_argument('--output', help="Output path (defaults to stdout)")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = deviation_export_queryset(
+            start=self._parse_time(options, 'start'),
+            end=self._parse_time(options, 'end'),
+            severity=options['severity'],
+            session_id=options['session']
+        )
+        _, lines = EXPORT_FORMATS[options['format']]
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                count = self._write(f, lines(queryset, options['chunk_size']))
+            self.stderr.write(self.style.SUCCESS(f"Wrote {count} lines to {options['output']}"))
+        else:
+            self._write(sys.stdout, lines(queryset, options['chunk_size']))
+
+    def _parse_time(self, options, name):
+        value = options[name]
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"--{name} must be an ISO 8601 datetime")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+    def _write(self, stream, lines):
+        count = 0
+        for line in lines:
+            stream.write(line)
+            count += 1
+        return count
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics.models import Deviation
+from analytics.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = "Rebuilds the deviation rollup tables from the raw deviation history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = rebuild_rollups(Deviation, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups from {total} deviations"))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviationDescriptionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description_hash', models.CharField(max_length=40, unique=True)),
+                ('description', models.TextField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeviationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('bucket_start', models.DateTimeField()),
+                ('severity', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='deviation',
+            index=models.Index(fields=['timestamp', 'id'], name='deviation_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deviation',
+            index=models.Index(fields=['severity', 'timestamp'], name='deviation_severity_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deviation',
+            index=models.Index(fields=['session_id', 'timestamp'], name='deviation_session_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deviationdescriptionstat',
+            index=models.Index(fields=['-count'], name='description_stat_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='deviationrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start', 'severity'), name='unique_deviation_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    from analytics.rollups import rebuild_rollups
+
+    rebuild_rollups(
+        apps.get_model('analytics', 'Deviation'),
+        apps.get_model('analytics', 'DeviationRollup'),
+        apps.get_model('analytics', 'DeviationDescriptionStat')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_deviation_indexes_and_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -16,5 +16,58 @@ class Deviation(models.Model):
     session_id = models.CharField(max_length=100, blank=True, null=True)
     tool_signature = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='deviation_timestamp_idx'),
+            models.Index(fields=['severity', 'timestamp'], name='deviation_severity_ts_idx'),
+            models.Index(fields=['session_id', 'timestamp'], name='deviation_session_ts_idx'),
+        ]
+
     def __str__(self):
         return f"[{self.severity}] {self.timestamp} - {self.description[:50]}..."
+
+class DeviationRollup(models.Model):
+    """
+    Deviation counts per severity in fixed time buckets, maintained
+    incrementally as deviations are written.
+    """
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    GRANULARITY_CHOICES = [
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+    ]
+
+    granularity = models.CharField(max_length=6, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    severity = models.CharField(max_length=10, choices=Deviation.SEVERITY_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'severity'],
+                name='unique_deviation_rollup_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start} [{self.severity}] x{self.count}"
+
+class DeviationDescriptionStat(models.Model):
+    """
+    Running count of each distinct (normalised) deviation description.
+    """
+    description_hash = models.CharField(max_length=40, unique=True)
+    description = models.TextField()
+    count = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count'], name='description_stat_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"x{self.count} - {self.description[:50]}..."
@@ -0,0 +1,229 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+from .sinks import build_sink
+
+logger = logging.getLogger(__name__)
+
+class AnalyticsPipeline:
+    """
+    Asynchronous export queue in front of the warehouse sink.
+
+    `enqueue` never blocks the audit loop: rows go into a bounded in-memory
+    queue that a background thread drains in batches by row count, byte
+    size or interval. Failed batches are retried with backoff and then
+    spilled to an NDJSON file, which is replayed after the next successful
+    write and every `replay_interval` seconds. When the queue is full, new
+    rows go to a second bounded buffer that the background thread spills
+    to disk; once that is full too, rows are dropped and counted.
+    """
+
+    def __init__(self, sink, max_queue_rows=10000, batch_rows=500, batch_bytes=1_000_000,
+                 flush_interval=1.0, max_retries=3, retry_backoff=0.5, spill_path=None,
+                 replay_interval=30.0):
+        self.sink = sink
+        self.max_queue_rows = max_queue_rows
+        self.batch_rows = batch_rows
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self.replay_interval = replay_interval
+        self._queue = deque()
+        self._overflow = deque()
+        self._next_replay = 0.0
+        self._queued_bytes = 0
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.stats = defaultdict(int)
+
+    @classmethod
+    def from_settings(cls):
+        sink = build_sink(
+            settings.ANALYTICS_SINK,
+            dataset_id=settings.BIGQUERY_DATASET,
+            directory=settings.ANALYTICS_SINK_DIR
+        )
+        return cls(
+            sink,
+            max_queue_rows=settings.ANALYTICS_QUEUE_MAX_ROWS,
+            batch_rows=settings.ANALYTICS_BATCH_ROWS,
+            batch_bytes=settings.ANALYTICS_BATCH_BYTES,
+            flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+            max_retries=settings.ANALYTICS_MAX_RETRIES,
+            spill_path=settings.ANALYTICS_SPILL_PATH,
+            replay_interval=settings.ANALYTICS_SPILL_REPLAY_INTERVAL
+        )
+
+    def enqueue(self, table_id, row):
+        """
+        Queues `row` for `table_id`. Returns False if the queue was full and
+        the row was handed to the spill buffer (or dropped) instead. Until
+        the pipeline is closed this never touches the disk, so it is safe
+        to call from the event loop.
+        """
+        line = json.dumps({"table": table_id, "row": row}, default=str)
+
+        with self._condition:
+            if not self._closed and len(self._queue) < self.max_queue_rows:
+                self._ensure_thread()
+                self._queue.append((table_id, row, len(line)))
+                self._queued_bytes += len(line)
+                self.stats["rows_enqueued"] += 1
+                if len(self._queue) >= self.batch_rows or self._queued_bytes >= self.batch_bytes:
+                    self._condition.notify()
+                return True
+
+            self.stats["rows_overflowed"] += 1
+            if len(self._overflow) >= self.max_queue_rows:
+                self.stats["rows_dropped"] += 1
+                return False
+            self._overflow.append(line)
+            closed = self._closed
+            if not closed:
+                self._ensure_thread()
+                self._condition.notify()
+
+        if closed:
+            self._spill_overflow()
+        return False
+
+    def flush(self):
+        self._spill_overflow()
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=max(self.flush_interval * 5, 1.0))
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="analytics-pipeline", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and not self._batch_ready() and not self._overflow:
+                    self._condition.wait(timeout=self.flush_interval)
+                closed = self._closed
+            if closed:
+                break
+
+            self._spill_overflow()
+            batch = self._take_batch()
+            if batch:
+                if self._write(batch):
+                    self._replay_spill()
+            elif time.monotonic() >= self._next_replay:
+                # Also retry on a timer, so spilled rows do not wait for
+                # fresh traffic once the sink is back.
+                self._replay_spill()
+
+    def _batch_ready(self):
+        return len(self._queue) >= self.batch_rows or self._queued_bytes >= self.batch_bytes
+
+    def _spill_overflow(self):
+        with self._condition:
+            lines, self._overflow = list(self._overflow), deque()
+        if lines:
+            self._spill(lines)
+
+    def _take_batch(self):
+        batch, size = [], 0
+        with self._condition:
+            while self._queue and len(batch) < self.batch_rows and size < self.batch_bytes:
+                table_id, row, nbytes = self._queue.popleft()
+                self._queued_bytes -= nbytes
+                size += nbytes
+                batch.append((table_id, row))
+        return batch
+
+    def _write(self, batch):
+        by_table = defaultdict(list)
+        for table_id, row in batch:
+            by_table[table_id].append(row)
+
+        ok = True
+        for table_id, rows in by_table.items():
+            if self._write_with_retry(table_id, rows):
+                self.stats["rows_written"] += len(rows)
+            else:
+                ok = False
+                self._spill([json.dumps({"table": table_id, "row": row}, default=str) for row in rows])
+        return ok
+
+    def _write_with_retry(self, table_id, rows):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write_batch(table_id, rows)
+                return True
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.warning(f"Analytics sink write failed for {table_id} (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+        return False
+
+    def _spill(self, lines):
+        if not self.spill_path:
+            self.stats["rows_dropped"] += len(lines)
+            logger.error(f"Dropped {len(lines)} analytics rows (no spill file configured)")
+            return
+
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.writelines(line + "\n" for line in lines)
+        self.stats["rows_spilled"] += len(lines)
+
+    def _replay_spill(self):
+        self._next_replay = time.monotonic() + self.replay_interval
+        replay_path = f"{self.spill_path}.replay" if self.spill_path else None
+        if not replay_path or not (os.path.exists(self.spill_path) or os.path.exists(replay_path)):
+            return
+
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+
+        # Stop at the first batch the sink rejects (_write has spilled it
+        # again) and put the unread remainder back behind it.
+        batch, ok = [], True
+        with open(replay_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                batch.append((entry["table"], entry["row"]))
+                if len(batch) >= self.batch_rows:
+                    ok, batch = self._write(batch), []
+                    if not ok:
+                        self._spill([rest.rstrip("\n") for rest in f])
+                        break
+        if ok and batch:
+            ok = self._write(batch)
+
+        os.remove(replay_path)
+        if ok:
+            logger.info("Replayed spilled analytics rows")
+
+# Singleton instance
+analytics_pipeline = AnalyticsPipeline.from_settings()
+atexit.register(analytics_pipeline.close)
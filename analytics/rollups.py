@@ -0,0 +1,101 @@
+import hashlib
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import DeviationDescriptionStat, DeviationRollup
+
+BUCKET_WIDTHS = {
+    DeviationRollup.MINUTE: timedelta(minutes=1),
+    DeviationRollup.HOUR: timedelta(hours=1),
+}
+
+def bucket_start(timestamp, granularity):
+    if granularity == DeviationRollup.HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+def description_key(description):
+    normalized = " ".join(description.lower().split())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest(), normalized
+
+def _upsert(model, lookup, increment, create):
+    # Concurrent writers can both miss the update and race to create the
+    # same row; the loser's create fails inside its savepoint and it
+    # falls back to the update, leaving the outer batch intact.
+    for attempt in range(2):
+        if model.objects.filter(**lookup).update(**increment):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, **create)
+            return
+        except IntegrityError:
+            if attempt:
+                raise
+
+def apply_rollups(deviations, rollup_model=DeviationRollup, stat_model=DeviationDescriptionStat):
+    """
+    Folds freshly written deviations into the per-minute and per-hour
+    severity buckets and the description counters. Call inside the
+    transaction that wrote the rows. The model arguments let data
+    migrations pass their historical models.
+    """
+    buckets = Counter()
+    descriptions = {}
+
+    for deviation in deviations:
+        for granularity in (DeviationRollup.MINUTE, DeviationRollup.HOUR):
+            buckets[(granularity, bucket_start(deviation.timestamp, granularity), deviation.severity)] += 1
+
+        key, _ = description_key(deviation.description)
+        count, first_seen, last_seen, text = descriptions.get(
+            key, (0, deviation.timestamp, deviation.timestamp, deviation.description)
+        )
+        descriptions[key] = (
+            count + 1,
+            min(first_seen, deviation.timestamp),
+            max(last_seen, deviation.timestamp),
+            text
+        )
+
+    for (granularity, start, severity), count in buckets.items():
+        _upsert(
+            rollup_model,
+            {'granularity': granularity, 'bucket_start': start, 'severity': severity},
+            {'count': F('count') + count},
+            {'count': count}
+        )
+
+    for key, (count, first_seen, last_seen, text) in descriptions.items():
+        _upsert(
+            stat_model,
+            {'description_hash': key},
+            {'count': F('count') + count, 'last_seen': Greatest('last_seen', Value(last_seen))},
+            {'description': text, 'count': count, 'first_seen': first_seen, 'last_seen': last_seen}
+        )
+
+def rebuild_rollups(deviation_model, rollup_model=DeviationRollup, stat_model=DeviationDescriptionStat,
+                    chunk_size=5000):
+    """
+    Replaces the rollup tables with counts recomputed from every stored
+    deviation and returns how many deviations were folded in.
+    """
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        stat_model.objects.all().delete()
+
+        chunk, total = [], 0
+        for deviation in deviation_model.objects.order_by('id').iterator(chunk_size=chunk_size):
+            chunk.append(deviation)
+            if len(chunk) >= chunk_size:
+                apply_rollups(chunk, rollup_model, stat_model)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            apply_rollups(chunk, rollup_model, stat_model)
+            total += len(chunk)
+    return total
@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+from .models import Deviation, DeviationDescriptionStat, DeviationRollup
+
+class DeviationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Deviation
+        fields = ['id', 'timestamp', 'severity', 'description', 'recommended_action', 'session_id']
+
+class DeviationRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeviationRollup
+        fields = ['bucket_start', 'severity', 'count']
+
+class DescriptionStatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeviationDescriptionStat
+        fields = ['description', 'count', 'first_seen', 'last_seen']
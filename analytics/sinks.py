@@ -0,0 +1,44 @@
+import json
+import os
+
+class BigQuerySink:
+    """
+    Writes batches to BigQuery through the shared BigQueryClient.
+    """
+
+    def __init__(self, dataset_id, client=None):
+        self.dataset_id = dataset_id
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from .bigquery_client import bq_client
+            self._client = bq_client
+        return self._client
+
+    def write_batch(self, table_id, rows):
+        errors = self.client.insert_rows(self.dataset_id, table_id, rows)
+        if errors:
+            raise IOError(f"BigQuery rejected {len(errors)} rows for {table_id}: {errors[:3]}")
+
+class FileSink:
+    """
+    Local stand-in for the warehouse: appends each table's rows to
+    `<directory>/<table>.ndjson`.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write_batch(self, table_id, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{table_id}.ndjson"), 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+
+def build_sink(name, **options):
+    if name == "bigquery":
+        return BigQuerySink(options["dataset_id"])
+    if name == "file":
+        return FileSink(options["directory"])
+    raise ValueError(f"Unknown analytics sink: {name}")
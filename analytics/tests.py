@@ -1,3 +1,196 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from .exports import EXPORT_CHUNK_SIZE
+from .deviation_writer import DeviationWriter
+from .models import Deviation, DeviationRollup
+from .pipeline import AnalyticsPipeline
+from .rollups import apply_rollups
+
+class DeviationExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Deviation.objects.bulk_create([
+            Deviation(severity='HIGH', description=f"Deviation {i}", recommended_action="Stop", session_id="s1")
+            for i in range(EXPORT_CHUNK_SIZE + 5)
+        ])
+
+    async def test_asgi_export_streams_async_chunks(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            response = await self.async_client.get('/api/analytics/deviations/export/', {'format': 'ndjson'})
+            self.assertTrue(response.streaming)
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertFalse([w for w in caught if "synchronous iterators" in str(w.message)])
+        self.assertEqual(len(chunks), 2)
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), EXPORT_CHUNK_SIZE + 5)
+        self.assertEqual(json.loads(lines[0])['description'], "Deviation 0")
+
+    def test_wsgi_export_streams_csv(self):
+        response = self.client.get('/api/analytics/deviations/export/', {'format': 'csv'})
+        self.assertFalse(response.is_async)
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], "id,timestamp,severity,description,recommended_action,session_id")
+        self.assertEqual(len(rows), EXPORT_CHUNK_SIZE + 6)
+
+def _at(hour, minute):
+    return datetime(2026, 1, 1, hour, minute, tzinfo=dt_timezone.utc)
+
+class DeviationRollupTests(TestCase):
+    def _log(self, *timestamps):
+        rows = Deviation.objects.bulk_create([
+            Deviation(severity='HIGH', description="Guard removed", recommended_action="Stop", session_id="s1")
+            for _ in timestamps
+        ])
+        for row, timestamp in zip(rows, timestamps):
+            row.timestamp = timestamp
+        Deviation.objects.bulk_update(rows, ['timestamp'])
+        apply_rollups(rows)
+
+    def test_severity_counts_clip_partial_buckets(self):
+        self._log(_at(10, 10), _at(10, 40), _at(11, 30), _at(12, 5))
+        response = self.client.get('/api/analytics/severity-counts/', {
+            'start': '2026-01-01T10:30:00Z', 'end': '2026-01-01T12:00:00Z', 'granularity': 'hour'
+        })
+        self.assertEqual(response.json()['counts']['HIGH'], 2)
+
+        response = self.client.get('/api/analytics/severity-counts/', {
+            'start': '2026-01-01T10:30:00Z', 'end': '2026-01-01T10:45:00Z', 'granularity': 'hour'
+        })
+        self.assertEqual(response.json()['total'], 1)
+
+    def test_severity_counts_tolerate_unknown_severities(self):
+        Deviation.objects.create(severity='SEVERE', description="Legacy row", recommended_action="None")
+        Deviation.objects.create(severity='HIGH', description="Guard removed", recommended_action="Stop")
+        response = self.client.get('/api/analytics/severity-counts/', {'granularity': 'minute'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['counts']['SEVERE'], 1)
+        self.assertEqual(response.json()['total'], 2)
+
+    def test_concurrent_bucket_create_falls_back_to_update(self):
+        # Another worker created the buckets after our update missed them.
+        for granularity in (DeviationRollup.MINUTE, DeviationRollup.HOUR):
+            DeviationRollup.objects.create(granularity=granularity, bucket_start=_at(9, 0), severity='HIGH', count=1)
+        row = Deviation(severity='HIGH', description="Guard removed", recommended_action="Stop", session_id="s1")
+        row.timestamp = _at(9, 0)
+
+        update, missed = QuerySet.update, []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is DeviationRollup and not missed:
+                missed.append(True)
+                return 0
+            missed.clear()
+            return update(queryset, **kwargs)
+
+        with transaction.atomic(), mock.patch.object(QuerySet, 'update', racing_update):
+            apply_rollups([row])
+
+        self.assertEqual(
+            list(DeviationRollup.objects.order_by('granularity').values_list('granularity', 'count')),
+            [('hour', 2), ('minute', 2)]
+        )
+
+class _FlakySink:
+    def __init__(self):
+        self.up = False
+        self.rows = []
+
+    def write_batch(self, table_id, rows):
+        if not self.up:
+            raise RuntimeError("sink unavailable")
+        self.rows.extend(rows)
+
+class AnalyticsPipelineSpillTests(SimpleTestCase):
+    def _wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_overflow_spills_off_caller_and_replays_on_timer(self):
+        spill_path = os.path.join(tempfile.mkdtemp(), "spill.ndjson")
+        sink = _FlakySink()
+        pipeline = AnalyticsPipeline(
+            sink, max_queue_rows=4, batch_rows=2, flush_interval=0.02, max_retries=0,
+            retry_backoff=0, spill_path=spill_path, replay_interval=0.1
+        )
+        self.addCleanup(pipeline.close)
+        spill, spill_threads = pipeline._spill, set()
+
+        def record_spill(lines):
+            spill_threads.add(threading.get_ident())
+            spill(lines)
+
+        pipeline._spill = record_spill
+        # Hold the flusher back so the queue fills deterministically.
+        with mock.patch.object(pipeline, '_ensure_thread'):
+            accepted = [pipeline.enqueue("events", {"i": i}) for i in range(12)]
+        self.assertEqual(accepted.count(True), 4)
+        self.assertEqual(pipeline.stats["rows_dropped"], 4)
+        self.assertFalse(spill_threads)
+
+        pipeline._ensure_thread()
+        self._wait_for(lambda: os.path.exists(spill_path) and sum(1 for _ in open(spill_path)) == 8)
+        self.assertNotIn(threading.get_ident(), spill_threads)
+
+        # No new rows arrive; the timer alone brings the spilled rows back.
+        sink.up = True
+        self._wait_for(lambda: len(sink.rows) == 8)
+        self.assertEqual(sorted(row["i"] for row in sink.rows), list(range(8)))
+
+class DeviationWriterTests(TransactionTestCase):
+    def _writer(self, **options):
+        writer = DeviationWriter(**options)
+        self.addCleanup(writer.close)
+        return writer
+
+    def _fields(self, i):
+        return {"severity": "HIGH", "description": f"Deviation {i}", "recommended_action": "Stop", "session_id": "s1"}
+
+    def test_full_batch_commits_without_waiting_for_the_interval(self):
+        writer = self._writer(batch_size=5, flush_interval=60)
+        started = time.monotonic()
+        futures = [writer.submit(**self._fields(i)) for i in range(5)]
+        rows = [future.result(timeout=5) for future in futures]
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([row.description for row in rows], [f"Deviation {i}" for i in range(5)])
+        self.assertEqual(len({row.id for row in rows}), 5)
+        self.assertTrue(all(row.id for row in rows))
+        self.assertEqual(
+            list(Deviation.objects.order_by('id').values_list('id', flat=True)), [row.id for row in rows]
+        )
+        self.assertEqual(
+            list(DeviationRollup.objects.values_list('granularity', 'count').order_by('granularity')),
+            [('hour', 5), ('minute', 5)]
+        )
+
+    def test_partial_batch_commits_after_the_flush_interval(self):
+        writer = self._writer(batch_size=100, flush_interval=0.05)
+        row = writer.write(timeout=5, **self._fields(0))
+        self.assertEqual(Deviation.objects.get(id=row.id).description, "Deviation 0")
+
+    def test_close_flushes_pending_rows(self):
+        writer = self._writer(batch_size=100, flush_interval=60)
+        futures = [writer.submit(**self._fields(i)) for i in range(3)]
+        self.assertFalse(any(future.done() for future in futures))
+
+        writer.close()
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(Deviation.objects.count(), 3)
+        with self.assertRaises(RuntimeError):
+            writer.submit(**self._fields(3))
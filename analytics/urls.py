@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('severity-counts/', views.SeverityCountsView.as_view(), name='analytics-severity-counts'),
+    path('timeline/', views.DeviationTimelineView.as_view(), name='analytics-timeline'),
+    path('sessions/<str:session_id>/timeline/', views.SessionTimelineView.as_view(), name='analytics-session-timeline'),
+    path('top-descriptions/', views.TopDescriptionsView.as_view(), name='analytics-top-descriptions'),
+    path('deviations/feed/', views.DeviationFeedView.as_view(), name='analytics-deviation-feed'),
+    path('deviations/export/', views.DeviationExportView.as_view(), name='analytics-deviation-export'),
+]
@@ -1,3 +1,208 @@
-from django.shortcuts import render
+from datetime import timedelta, timezone as dt_timezone
 
-# Create your views here.
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .exports import EXPORT_FORMATS, aiter_lines, deviation_export_queryset
+from .feed import deviation_payload, deviations_after
+from .models import Deviation, DeviationDescriptionStat, DeviationRollup
+from .rollups import BUCKET_WIDTHS, bucket_start
+from .serializers import DescriptionStatSerializer, DeviationRollupSerializer, DeviationSerializer
+
+MAX_LIMIT = 1000
+
+def _parse_time(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: "Expected an ISO 8601 datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+def _parse_range(request):
+    end = _parse_time(request, 'end', timezone.now())
+    start = _parse_time(request, 'start', end - timedelta(hours=24))
+    if start >= end:
+        raise ValidationError({'start': "Must be before end."})
+    return start, end
+
+def _parse_limit(request, default):
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        raise ValidationError({'limit': "Expected an integer."})
+    return max(1, min(limit, MAX_LIMIT))
+
+def _parse_granularity(request):
+    granularity = request.query_params.get('granularity', DeviationRollup.HOUR)
+    if granularity not in dict(DeviationRollup.GRANULARITY_CHOICES):
+        raise ValidationError({'granularity': "Expected 'minute' or 'hour'."})
+    return granularity
+
+def _severity_filter(request, queryset):
+    severity = request.query_params.get('severity')
+    if severity:
+        queryset = queryset.filter(severity=severity.upper())
+    return queryset
+
+def _rollups(request):
+    start, end = _parse_range(request)
+    granularity = _parse_granularity(request)
+    start = bucket_start(start, granularity)
+    buckets = DeviationRollup.objects.filter(
+        granularity=granularity,
+        bucket_start__gte=start,
+        bucket_start__lt=end
+    )
+    return start, end, granularity, _severity_filter(request, buckets)
+
+class SeverityCountsView(APIView):
+    """
+    Deviation counts per severity over exactly [start, end). Whole buckets
+    are summed from the rollups; the partial buckets at either edge of
+    the range are counted from the raw deviations.
+    """
+
+    def get(self, request):
+        start, end = _parse_range(request)
+        granularity = _parse_granularity(request)
+        first_full = bucket_start(start, granularity)
+        if first_full < start:
+            first_full += BUCKET_WIDTHS[granularity]
+        last_full = bucket_start(end, granularity)
+
+        totals = {severity: 0 for severity, _ in Deviation.SEVERITY_CHOICES}
+        if first_full < last_full:
+            buckets = DeviationRollup.objects.filter(
+                granularity=granularity,
+                bucket_start__gte=first_full,
+                bucket_start__lt=last_full
+            )
+            edges = [(start, first_full), (last_full, end)]
+        else:
+            buckets = DeviationRollup.objects.none()
+            edges = [(start, end)]
+
+        for row in _severity_filter(request, buckets).values('severity').annotate(total=Sum('count')):
+            totals[row['severity']] = totals.get(row['severity'], 0) + row['total']
+        for edge_start, edge_end in edges:
+            if edge_start >= edge_end:
+                continue
+            raw = Deviation.objects.filter(timestamp__gte=edge_start, timestamp__lt=edge_end)
+            for row in _severity_filter(request, raw).values('severity').annotate(total=Count('id')):
+                totals[row['severity']] = totals.get(row['severity'], 0) + row['total']
+
+        return Response({
+            'start': start,
+            'end': end,
+            'granularity': granularity,
+            'counts': totals,
+            'total': sum(totals.values()),
+        })
+
+class DeviationTimelineView(APIView):
+    """
+    Per-bucket deviation counts by severity over a time range. Buckets are
+    whole: `start` is rounded down to its bucket, so the first and last
+    buckets may include deviations just outside the requested range.
+    """
+
+    def get(self, request):
+        start, end, granularity, buckets = _rollups(request)
+        return Response({
+            'start': start,
+            'end': end,
+            'granularity': granularity,
+            'buckets': DeviationRollupSerializer(buckets.order_by('bucket_start', 'severity'), many=True).data,
+        })
+
+class SessionTimelineView(APIView):
+    """
+    Deviations logged by one auditor session, oldest first.
+    """
+
+    def get(self, request, session_id):
+        start, end = _parse_range(request)
+        deviations = Deviation.objects.filter(
+            session_id=session_id,
+            timestamp__gte=start,
+            timestamp__lt=end
+        ).order_by('timestamp', 'id')[:_parse_limit(request, 200)]
+
+        return Response({
+            'session_id': session_id,
+            'deviations': DeviationSerializer(deviations, many=True).data,
+        })
+
+class DeviationFeedView(APIView):
+    """
+    Cursor-paginated deviation feed for dashboard backfill. Pass the last
+    seen `cursor` to receive everything logged after it; without one the
+    feed starts at `start` (default: 24 hours ago).
+    """
+
+    def get(self, request):
+        cursor = request.query_params.get('cursor')
+        start = None if cursor else _parse_time(request, 'start', timezone.now() - timedelta(hours=24))
+        try:
+            deviations, next_cursor, has_more = deviations_after(
+                cursor=cursor, start=start, limit=_parse_limit(request, 100)
+            )
+        except ValueError as e:
+            raise ValidationError({'cursor': str(e)})
+
+        return Response({
+            'deviations': [deviation_payload(deviation) for deviation in deviations],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        })
+
+class TopDescriptionsView(APIView):
+    """
+    Most frequently recurring deviation descriptions.
+    """
+
+    def get(self, request):
+        stats = DeviationDescriptionStat.objects.order_by('-count')[:_parse_limit(request, 10)]
+        return Response({'descriptions': DescriptionStatSerializer(stats, many=True).data})
+
+class DeviationExportView(APIView):
+    """
+    Streams the full deviation history as NDJSON or CSV, filtered by
+    start/end, severity and session_id.
+    """
+
+    def perform_content_negotiation(self, request, force=False):
+        # `?format=` picks the export encoding here, not a DRF renderer.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        export_format = request.query_params.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'format': "Expected 'ndjson' or 'csv'."})
+
+        queryset = deviation_export_queryset(
+            start=_parse_time(request, 'start', None),
+            end=_parse_time(request, 'end', None),
+            severity=request.query_params.get('severity'),
+            session_id=request.query_params.get('session_id')
+        )
+
+        content_type, lines = EXPORT_FORMATS[export_format]
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_lines(lines, queryset)
+        else:
+            content = lines(queryset)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="deviations.{export_format}"'
+        return response
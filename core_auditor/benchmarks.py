@@ -0,0 +1,265 @@
+"""
+Micro-benchmarks for the per-message hot paths.
+
+Each benchmark is a zero-argument callable timed in calibrated loops;
+`run_benchmark` reports robust statistics (median and interquartile
+range over repeated samples) plus allocation figures from tracemalloc,
+and `compare` flags medians that moved beyond both a relative threshold
+and the baseline's own noise.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+
+BENCHMARKS = {}
+
+def benchmark(name, settings=None):
+    """
+    Registers a benchmark factory; `settings` are overridden while it is
+    built and timed.
+    """
+    def register(factory):
+        factory.settings = settings or {}
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+def _orchestrator(gemini_response=None):
+    from .services.orchestrator import AuditorOrchestrator
+
+    orchestrator = AuditorOrchestrator(session_id="bench")
+    if gemini_response is not None:
+        orchestrator.gemini.enabled = True
+        orchestrator.gemini.send_message = lambda message, stream=False: gemini_response
+        orchestrator.gemini.get_history = lambda: []
+    return orchestrator
+
+def _stub_response():
+    """
+    A canned Gemini reply with one text part and one function call, built
+    from the same protos the SDK returns.
+    """
+    import google.generativeai as genai
+
+    function_call = genai.protos.FunctionCall(
+        name="search_knowledge_vault",
+        args={"query": "sharps handling protocol"}
+    )
+    return genai.protos.GenerateContentResponse(candidates=[
+        genai.protos.Candidate(content=genai.protos.Content(role="model", parts=[
+            genai.protos.Part(text="Checking the sharps handling protocol before advising."),
+            genai.protos.Part(function_call=function_call),
+        ]))
+    ])
+
+@benchmark("orchestrator.process_input[simulation]")
+def bench_process_input_simulation():
+    orchestrator = _orchestrator()
+    return lambda: orchestrator.process_input("Surgeon is proceeding with the incision.")
+
+@benchmark("orchestrator.process_input[stubbed_gemini]")
+def bench_process_input_stubbed():
+    orchestrator = _orchestrator(_stub_response())
+    return lambda: orchestrator.process_input("What is the protocol for passing sharps?")
+
+def _text_response(text):
+    import google.generativeai as genai
+
+    return genai.protos.GenerateContentResponse(candidates=[
+        genai.protos.Candidate(content=genai.protos.Content(role="model", parts=[genai.protos.Part(text=text)]))
+    ])
+
+def _arespond(orchestrator, message):
+    # One loop for the whole run so the timing excludes loop setup.
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+
+    async def turn():
+        async for _ in orchestrator.arespond(message):
+            pass
+
+    return lambda: loop.run_until_complete(turn())
+
+@benchmark("orchestrator.arespond[simulation]")
+def bench_arespond_simulation():
+    return _arespond(_orchestrator(), "Surgeon is proceeding with the incision.")
+
+@benchmark("orchestrator.arespond[stubbed_gemini]")
+def bench_arespond_stubbed():
+    """
+    Full tool round: the stubbed model asks for a vault search, the tool
+    runs, and the follow-up generation answers in text.
+    """
+    orchestrator = _orchestrator(_stub_response())
+    follow_up = _text_response("Pass sharps through the neutral zone.")
+
+    async def send_message_async(message, stream=False, tool_config=None):
+        return follow_up if isinstance(message, list) else orchestrator.gemini.send_message(message)
+
+    orchestrator.gemini.send_message_async = send_message_async
+    return _arespond(orchestrator, "What is the protocol for passing sharps?")
+
+@benchmark("orchestrator.collect_parts")
+def bench_collect_parts():
+    orchestrator = _orchestrator()
+    response = _stub_response()
+    return lambda: orchestrator._collect_parts(response, orchestrator._new_result())
+
+@benchmark("orchestrator.format_tool_result[log_deviation]")
+def bench_format_deviation():
+    orchestrator = _orchestrator()
+    args = {"severity": "HIGH", "description": "Unsafe scalpel pass", "recommended_action": "Use the neutral zone."}
+    tool_result = {"status": "success", "id": "42", "timestamp": "2025-01-01T12:00:00.000000"}
+    return lambda: orchestrator._format_tool_result("log_deviation", args, tool_result)
+
+@benchmark("orchestrator.format_tool_result[search]")
+def bench_format_search():
+    orchestrator = _orchestrator()
+    args = {"query": "sharps"}
+    tool_result = {"results": ["Standard Operating Procedure 6.1.2: pass sharps in a neutral zone."] * 3}
+    return lambda: orchestrator._format_tool_result("search_knowledge_vault", args, tool_result)
+
+def _deviation_commit(batch_size):
+    # Times the write-behind commit itself (bulk_create plus rollups);
+    # going through log_deviation would time the flush interval instead.
+    from concurrent.futures import Future
+    from analytics.deviation_writer import deviation_writer
+
+    fields = {"severity": "HIGH", "description": "Benchmark deviation", "recommended_action": "No action",
+              "session_id": "bench", "tool_signature": "log_deviation"}
+    return lambda: deviation_writer._commit([(fields, Future()) for _ in range(batch_size)])
+
+@benchmark("deviation_writer.commit[1]")
+def bench_deviation_commit_single():
+    return _deviation_commit(1)
+
+@benchmark("deviation_writer.commit[100]")
+def bench_deviation_commit_batch():
+    return _deviation_commit(100)
+
+@benchmark("rules.match")
+def bench_rules_match():
+    from .services.rules import get_rule_engine
+
+    engine = get_rule_engine()
+    return lambda: engine.match("Circulating nurse reports the sponge count is off near the sterile field.")
+
+@benchmark("response_cache.hit", settings={"AEGIS_RESPONSE_CACHE": True})
+def bench_response_cache_hit():
+    # The lookup arespond does: key construction plus the LRU get.
+    from .services.response_cache import response_cache
+
+    orchestrator = _orchestrator()
+    message = "Surgeon is proceeding with the incision."
+    response_cache.clear()
+    response_cache.set(orchestrator._cache_key(message, "text", None), orchestrator._new_result())
+    return lambda: response_cache.get(orchestrator._cache_key(message, "text", None))
+
+@benchmark("knowledge_vault.search[uncached]")
+def bench_vault_search_uncached():
+    from knowledge_vault.ingest import get_knowledge_vault
+
+    vault = get_knowledge_vault()
+    return lambda: vault.retrieve("sharps neutral zone scalpel", top_k=3)
+
+@benchmark("knowledge_vault.search[cached]")
+def bench_vault_search_cached():
+    from .services.tools import search_knowledge_vault
+
+    search_knowledge_vault("sharps neutral zone scalpel")
+    return lambda: search_knowledge_vault("sharps neutral zone scalpel")
+
+def _calibrate(func, min_time):
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+def _allocations(func, number):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        for _ in range(number):
+            func()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, 'filename'))
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes": max(peak - before, 0),
+        "retained_bytes_per_op": round((current - before) / number, 1),
+        "retained_blocks_per_op": round(blocks / number, 2),
+    }
+
+def run_benchmark(func, repeat=15, min_time=0.05, warmup=3):
+    """
+    Times `func` in `repeat` samples of a calibrated loop and returns
+    per-call statistics in microseconds plus allocation figures.
+    """
+    for _ in range(warmup):
+        func()
+    number = _calibrate(func, min_time)
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter_ns() - started) / number / 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "loops": number,
+        "repeat": repeat,
+        "median_us": round(statistics.median(samples), 3),
+        "mean_us": round(statistics.fmean(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "iqr_us": round(quartiles[2] - quartiles[0], 3),
+        "min_us": round(min(samples), 3),
+        "allocations": _allocations(func, min(number, 1000)),
+    }
+
+def compare(results, baseline, threshold=0.10):
+    """
+    Returns {name: {"baseline_us", "median_us", "change", "status"}} where
+    status is "regressed", "improved" or "unchanged". A change counts only
+    when it exceeds `threshold` and the larger of the two IQRs.
+    """
+    report = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            report[name] = {"median_us": result["median_us"], "status": "new"}
+            continue
+
+        delta = result["median_us"] - previous["median_us"]
+        change = delta / previous["median_us"] if previous["median_us"] else 0.0
+        noise = max(result["iqr_us"], previous.get("iqr_us", 0.0))
+        status = "unchanged"
+        if abs(change) > threshold and abs(delta) > noise:
+            status = "regressed" if delta > 0 else "improved"
+
+        report[name] = {
+            "baseline_us": previous["median_us"],
+            "median_us": result["median_us"],
+            "change": round(change, 4),
+            "status": status,
+        }
+    return report
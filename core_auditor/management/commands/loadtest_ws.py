@@ -0,0 +1,231 @@
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+MESSAGE_MIX = {
+    "normal": [
+        "Surgeon is proceeding with the incision.",
+        "Scrub nurse is passing the retractor.",
+        "Anesthesia reports stable vitals.",
+        "Closing the fascia with running suture.",
+    ],
+    "violation": [
+        "The surgeon is using an unsafe scalpel technique.",
+        "Observed a hand hygiene violation before gowning.",
+        "Circulating nurse reports the sponge count is off.",
+    ],
+    "protocol": [
+        "What is the protocol for passing sharps?",
+        "Check the protocol for the surgical time-out.",
+        "Which protocol covers sterile field breaches?",
+    ],
+}
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition(":")
+        kind = kind.strip()
+        if kind not in MESSAGE_MIX:
+            raise CommandError(f"Unknown message kind '{kind}' (expected one of {', '.join(MESSAGE_MIX)})")
+        try:
+            mix[kind] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f"Invalid weight for '{kind}': {weight}")
+    return mix
+
+class Command(BaseCommand):
+    help = (
+        "Opens concurrent /ws/auditor/ sessions against the in-process ASGI app in "
+        "simulation mode and reports throughput and latency percentiles as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help="Concurrent WebSocket sessions")
+        parser.add_argument('--messages', type=int, default=20, help="Messages sent by each session")
+        parser.add_argument('--mix', default="normal:70,violation:20,protocol:10",
+                            help="Weighted message mix, e.g. normal:70,violation:20,protocol:10")
+        parser.add_argument('--stream', action='store_true', help="Request streamed responses")
+        parser.add_argument('--protocol', choices=['json', 'msgpack'], default='json',
+                            help="Wire protocol negotiated by each session")
+        parser.add_argument('--subscribe', action='store_true',
+                            help="Subscribe every session to the deviation broadcast, like the dashboard")
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help="Seconds each session waits between messages")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-response timeout in seconds")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['clients'] < 1 or options['messages'] < 1:
+            raise CommandError("--clients and --messages must be positive")
+
+        # Sessions write real deviations; keep them out of the working database.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(GEMINI_API_KEY=""), contextlib.redirect_stdout(sys.stderr):
+                report = asyncio.run(self._run(options, mix))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote load test report to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    async def _run(self, options, mix):
+        from aegis_core.asgi import application
+
+        stats = {
+            "connect_ms": [],
+            "latency_ms": defaultdict(list),
+            "errors": defaultdict(int),
+            "broadcast_frames": 0,
+            "delta_frames": 0,
+            "wire_bytes": 0,
+        }
+        rng = random.Random(options['seed'])
+        kinds, weights = list(mix), list(mix.values())
+        plans = [
+            [rng.choices(kinds, weights)[0] for _ in range(options['messages'])]
+            for _ in range(options['clients'])
+        ]
+
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            self._client(application, plan, options, stats, random.Random(options['seed'] + i))
+            for i, plan in enumerate(plans)
+        ])
+        elapsed = time.perf_counter() - started
+
+        all_latencies = [value for values in stats["latency_ms"].values() for value in values]
+        sent = options['clients'] * options['messages']
+        errors = sum(stats["errors"].values())
+
+        return {
+            "config": {
+                "clients": options['clients'],
+                "messages_per_client": options['messages'],
+                "mix": mix,
+                "stream": options['stream'],
+                "protocol": options['protocol'],
+                "subscribe": options['subscribe'],
+                "think_time": options['think_time'],
+                "seed": options['seed'],
+            },
+            "duration_s": round(elapsed, 3),
+            "messages_sent": sent,
+            "responses": len(all_latencies),
+            "throughput_msgs_per_s": round(len(all_latencies) / elapsed, 2) if elapsed else None,
+            "error_rate": round(errors / sent, 4),
+            "errors": dict(stats["errors"]),
+            "connect_ms": summarize(stats["connect_ms"]),
+            "latency_ms": {
+                "overall": summarize(all_latencies),
+                **{kind: summarize(values) for kind, values in sorted(stats["latency_ms"].items())},
+            },
+            "frames": {
+                "audit_delta": stats["delta_frames"],
+                "deviation_broadcast": stats["broadcast_frames"],
+                "received_bytes": stats["wire_bytes"],
+            },
+        }
+
+    async def _client(self, application, plan, options, stats, rng):
+        from channels.testing import WebsocketCommunicator
+        from core_auditor.websockets.protocol import JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL, JsonCodec, MsgpackCodec
+
+        if options['protocol'] == 'msgpack':
+            codec, subprotocols = MsgpackCodec(), [MSGPACK_SUBPROTOCOL]
+        else:
+            codec, subprotocols = JsonCodec(), [JSON_SUBPROTOCOL]
+
+        path = "/ws/auditor/?subscribe=deviations" if options['subscribe'] else "/ws/auditor/"
+        communicator = WebsocketCommunicator(application, path, subprotocols=subprotocols)
+        started = time.perf_counter()
+        try:
+            connected, _ = await communicator.connect(timeout=options['timeout'])
+            if not connected:
+                stats["errors"]["connect_rejected"] += len(plan)
+                return
+            await communicator.receive_output(timeout=options['timeout'])
+        except Exception:
+            stats["errors"]["connect_failed"] += len(plan)
+            return
+        stats["connect_ms"].append((time.perf_counter() - started) * 1000)
+
+        try:
+            for kind in plan:
+                message = rng.choice(MESSAGE_MIX[kind])
+                started = time.perf_counter()
+                await communicator.send_to(**codec.encode({'type': 'text', 'message': message, 'stream': options['stream']}))
+
+                error = await self._await_response(communicator, codec, options['timeout'], stats)
+                if error:
+                    stats["errors"][error] += 1
+                else:
+                    stats["latency_ms"][kind].append((time.perf_counter() - started) * 1000)
+
+                if options['think_time']:
+                    await asyncio.sleep(options['think_time'])
+        finally:
+            await communicator.disconnect()
+
+    async def _await_response(self, communicator, codec, timeout, stats):
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return "timeout"
+            try:
+                output = await communicator.receive_output(timeout=remaining)
+            except asyncio.TimeoutError:
+                return "timeout"
+            if output.get('type') != 'websocket.send':
+                return "closed"
+
+            frame = codec.load(text_data=output.get('text'), bytes_data=output.get('bytes'))
+            stats["wire_bytes"] += len(output.get('text') or '') + len(output.get('bytes') or b'')
+
+            if frame.get('type') == 'audit_response':
+                return None
+            if frame.get('type') == 'error':
+                return "server_error"
+            if frame.get('type') == 'audit_delta':
+                stats["delta_frames"] += 1
+            elif frame.get('type') == 'deviation':
+                stats["broadcast_frames"] += 1
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core_auditor.services.sessions import session_store
+
+class Command(BaseCommand):
+    help = "Deletes session snapshots that are too old to be resumed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=float, default=settings.AEGIS_SESSION_TTL,
+                            help="Keep snapshots updated within this many seconds")
+
+    def handle(self, *args, **options):
+        if session_store is None:
+            raise CommandError("Session snapshots are disabled (AEGIS_SESSION_STORE is empty)")
+
+        deleted = session_store.purge(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired session snapshots"))
@@ -0,0 +1,78 @@
+import contextlib
+import fnmatch
+import json
+import os
+import platform
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core_auditor.benchmarks import BENCHMARKS, compare, run_benchmark
+
+class Command(BaseCommand):
+    help = "Runs the hot-path micro-benchmarks and compares them against a stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', default='*', help="Glob over benchmark names")
+        parser.add_argument('--repeat', type=int, default=15, help="Timing samples per benchmark")
+        parser.add_argument('--min-time', type=float, default=0.05, help="Minimum seconds per sample")
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmark_baseline.json'),
+                            help="Baseline file to compare against or write")
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help="Relative median change that counts as a regression")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit non-zero if any benchmark regressed")
+        parser.add_argument('--list', action='store_true', help="List benchmark names and exit")
+
+    def handle(self, *args, **options):
+        names = [name for name in BENCHMARKS if fnmatch.fnmatch(name, options['filter'])]
+        if options['list']:
+            self.stdout.write("\n".join(names))
+            return
+        if not names:
+            raise CommandError(f"No benchmarks match '{options['filter']}'")
+
+        # Persistence benchmarks write real rows; keep them out of the working database.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(GEMINI_API_KEY="", AEGIS_PRESCREEN_MIN_SEVERITY=""), \
+                    contextlib.redirect_stdout(sys.stderr):
+                results = {}
+                for name in names:
+                    factory = BENCHMARKS[name]
+                    with override_settings(**factory.settings):
+                        results[name] = run_benchmark(
+                            factory(), repeat=options['repeat'], min_time=options['min_time']
+                        )
+                    print(f"{name}: {results[name]['median_us']}us (IQR {results[name]['iqr_us']}us)")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+
+        baseline_path = options['baseline']
+        if os.path.exists(baseline_path) and not options['save_baseline']:
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            report["comparison"] = compare(results, baseline["results"], threshold=options['threshold'])
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if options['save_baseline']:
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stderr.write(self.style.SUCCESS(f"Saved baseline to {baseline_path}"))
+
+        regressed = [name for name, entry in report.get("comparison", {}).items() if entry["status"] == "regressed"]
+        if regressed and options['fail_on_regression']:
+            raise CommandError(f"Regressed: {', '.join(regressed)}")
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionSnapshot',
+            fields=[
+                ('session_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('state', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
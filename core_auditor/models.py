@@ -1 +1,13 @@
 from django.db import models
+
+class SessionSnapshot(models.Model):
+    """
+    Latest compacted state of an auditor session, so a client can resume
+    it after a reconnect on any worker.
+    """
+    session_id = models.CharField(max_length=32, primary_key=True)
+    state = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.session_id} ({len(self.state)} bytes, {self.updated_at})"
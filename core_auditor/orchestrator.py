@@ -1,5 +1,6 @@
 import json
 import logging
+from .services.rules import get_rule_engine
 from .tools import AEGIS_TOOLS, log_deviation, search_knowledge_vault
 
 logger = logging.getLogger(__name__)
@@ -29,24 +30,10 @@ class AuditorOrchestrator:
             "tool_use": None
         }
 
-        if "unsafe" in input_text.lower() or "violation" in input_text.lower():
-            response["tool_use"] = {
-                "name": "log_deviation",
-                "args": {
-                    "severity": "High",
-                    "description": f"Detected potential safety violation in: {input_text}",
-                    "recommended_action": "Halt procedure immediately and inspect."
-                }
-            }
-            response["content"] = "I have detected a critical safety risk and logged a deviation."
-        
-        elif "protocol" in input_text.lower():
-             response["tool_use"] = {
-                "name": "search_knowledge_vault",
-                "args": {"query": input_text}
-            }
-             response["content"] = "Consulting the Knowledge Vault..."
-        
+        matches = get_rule_engine().tool_calls(input_text)
+        if matches:
+            rule, response["tool_use"] = matches[0]
+            response["content"] = rule.message or "Screening rule matched."
         else:
             response["content"] = f"Acknowledged. Monitoring stream: {input_text[:20]}..."
 
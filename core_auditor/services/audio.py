@@ -0,0 +1,204 @@
+"""
+Streaming audio ingestion: PCM decoding, a fixed-size ring buffer and an
+energy-based voice activity detector.
+
+Clients send 16-bit PCM chunks ("audio/pcm", little-endian, or
+"audio/L16", big-endian per RFC 2586) with an optional ";rate=" mime
+parameter. Each stream gets a VoiceSegmenter that scores 20 ms frames in
+one vectorized pass and only emits voiced segments, bounded by
+max_segment_seconds. Silence never leaves the ring buffer, and the ring
+never grows past one segment plus pre-roll.
+"""
+import io
+import wave
+
+import numpy as np
+
+PCM_MIMES = {"audio/pcm": "<i2", "audio/l16": ">i2"}
+# The segmenter's ring is sized from the rate, so it must never come
+# straight from the client.
+SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+FULL_SCALE = 32768.0
+
+class AudioError(ValueError):
+    pass
+
+def is_audio(mime):
+    return bool(mime) and mime.startswith("audio/")
+
+def decode_pcm(data, mime, default_rate=16000):
+    """
+    Returns (samples, sample_rate) for a mono 16-bit PCM chunk.
+    """
+    kind, *params = [part.strip() for part in mime.split(";")]
+    dtype = PCM_MIMES.get(kind.lower())
+    if dtype is None:
+        raise AudioError(f"Unsupported audio type: {kind} (send 16-bit mono audio/pcm or audio/L16)")
+
+    rate = default_rate
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "rate":
+            try:
+                rate = int(value)
+            except ValueError:
+                raise AudioError(f"Invalid sample rate: {value}")
+    if rate not in SAMPLE_RATES:
+        raise AudioError(f"Unsupported sample rate: {rate} (use one of {', '.join(map(str, SAMPLE_RATES))})")
+    if len(data) % 2:
+        raise AudioError("PCM chunks must hold whole 16-bit samples")
+    return np.frombuffer(data, dtype=dtype).astype(np.int16), rate
+
+def frame_energy_db(frames):
+    """
+    Mean energy of each row of `frames` in dBFS.
+    """
+    power = np.mean(np.square(frames, dtype=np.float32), axis=1) / (FULL_SCALE * FULL_SCALE)
+    return 10.0 * np.log10(power + 1e-10)
+
+def encode_wav(samples, sample_rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def segment_part(samples, sample_rate):
+    return {"mime_type": "audio/wav", "data": encode_wav(samples, sample_rate)}
+
+def feed_chunk(segmenter, samples, final=False):
+    """
+    Runs `samples` through the segmenter (flushing it on the final chunk)
+    and returns (seconds, WAV part) for every completed segment.
+    """
+    segments = segmenter.feed(samples)
+    if final:
+        segments += segmenter.flush()
+    rate = segmenter.sample_rate
+    return [(len(segment) / rate, segment_part(segment, rate)) for segment in segments]
+
+class PcmRing:
+    """
+    Fixed-capacity ring of int16 samples keeping only the most recent
+    `capacity` samples.
+    """
+
+    def __init__(self, capacity):
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.end = 0
+        self.size = 0
+
+    def write(self, samples):
+        if len(samples) >= self.capacity:
+            self.buffer[:] = samples[-self.capacity:]
+            self.end, self.size = 0, self.capacity
+            return
+        first = min(len(samples), self.capacity - self.end)
+        self.buffer[self.end:self.end + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.end = (self.end + len(samples)) % self.capacity
+        self.size = min(self.capacity, self.size + len(samples))
+
+    def tail(self, count):
+        count = min(count, self.size)
+        start = (self.end - count) % self.capacity
+        if start + count <= self.capacity:
+            return self.buffer[start:start + count].copy()
+        return np.concatenate([self.buffer[start:], self.buffer[:self.end]])
+
+class VoiceSegmenter:
+    """
+    Splits a PCM stream into voiced segments. A frame is voiced when its
+    energy exceeds both `threshold_db` and the adaptive noise floor plus
+    `margin_db`. The floor starts `margin_db` below the threshold and only
+    learns from frames under the threshold, so a stream that opens
+    mid-speech is not mistaken for background noise. A segment starts at
+    the first voiced frame (with `preroll_ms` of lead-in), ends after
+    `hangover_ms` of silence and is cut at `max_segment_seconds`. Segments with less than `min_voiced_ms`
+    of voiced frames are discarded as clicks and bumps.
+    """
+
+    def __init__(self, sample_rate, frame_ms=20, threshold_db=-45.0, margin_db=10.0,
+                 hangover_ms=400, preroll_ms=200, min_voiced_ms=200, max_segment_seconds=15.0):
+        self.sample_rate = sample_rate
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.preroll = sample_rate * preroll_ms // 1000
+        self.min_voiced_frames = max(1, min_voiced_ms // frame_ms)
+        self.max_segment = int(sample_rate * max_segment_seconds)
+
+        self.ring = PcmRing(self.max_segment + self.frame_len)
+        self.remainder = np.zeros(0, dtype=np.int16)
+        self.noise_floor = threshold_db - margin_db
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self.in_speech = False
+        self.segment_len = 0
+        self.voiced_frames = 0
+        self.silent_run = 0
+
+    def feed(self, samples):
+        """
+        Adds a chunk and returns the list of segments (int16 arrays) it
+        completed.
+        """
+        samples = np.concatenate([self.remainder, samples]) if len(self.remainder) else samples
+        count = len(samples) // self.frame_len
+        self.remainder = samples[count * self.frame_len:].copy()
+        if not count:
+            return []
+
+        frames = samples[:count * self.frame_len].reshape(count, self.frame_len)
+        energies = frame_energy_db(frames)
+        segments = []
+        for frame, energy in zip(frames, energies):
+            voiced = energy > max(self.threshold_db, self.noise_floor + self.margin_db)
+            if energy < self.threshold_db:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(energy)
+
+            if self.segment_len + self.frame_len > self.ring.capacity:
+                self._emit(segments)
+                self.in_speech = voiced
+            self.ring.write(frame)
+
+            if not self.in_speech:
+                if voiced:
+                    self.in_speech = True
+                    self.segment_len = min(self.ring.size, self.preroll + self.frame_len)
+                    self.voiced_frames = 1
+                continue
+
+            self.segment_len += self.frame_len
+            if voiced:
+                self.voiced_frames += 1
+                self.silent_run = 0
+            else:
+                self.silent_run += 1
+                if self.silent_run >= self.hangover_frames:
+                    self._emit(segments)
+        return segments
+
+    def flush(self):
+        """
+        Ends the stream, returning the segment in progress if it has
+        enough voiced audio.
+        """
+        segments = []
+        if self.in_speech:
+            self._emit(segments)
+        self.remainder = np.zeros(0, dtype=np.int16)
+        return segments
+
+    def _emit(self, segments):
+        if self.voiced_frames >= self.min_voiced_frames:
+            # Trailing hangover silence is context the model does not need.
+            keep = self.segment_len - max(0, self.silent_run - 1) * self.frame_len
+            segments.append(self.ring.tail(self.segment_len)[:keep])
+        self._reset_segment()
@@ -1,33 +1,10 @@
-import google.generativeai as genai
 from django.conf import settings
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
-class GeminiClient:
-    
-    def __init__(self):
-        if not settings.GEMINI_API_KEY:
-            logger.warning("GEMINI_API_KEY not set. Using simulation mode.")
-            self.enabled = False
-            return
-        
-        try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel(
-                model_name=settings.GEMINI_MODEL,
-                tools=self._get_tools(),
-                system_instruction=self._get_system_instruction()
-            )
-            self.chat = None
-            self.enabled = True
-            logger.info(f"Gemini client initialized with model: {settings.GEMINI_MODEL}")
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini client: {e}")
-            self.enabled = False
-    
-    def _get_system_instruction(self):
-        return """You are AEGIS (Advanced Evaluation and Governance Intelligence System), an AI safety auditor monitoring high-stakes operations in real-time.
+SYSTEM_INSTRUCTION = """You are AEGIS (Advanced Evaluation and Governance Intelligence System), an AI safety auditor monitoring high-stakes operations in real-time.
 
 Your role and responsibilities:
 - Analyze video, audio, and text inputs for safety violations and regulatory non-compliance
@@ -48,10 +25,76 @@ Guidelines:
 - Maintain a professional, authoritative tone
 
 Remember: Lives may depend on your accurate and timely analysis."""
+
+class ModelRegistry:
+    
+    def __init__(self):
+        self._models = {}
+        self._configured = False
+        self._lock = threading.Lock()
+    
+    def get_model(self, model_name=None):
+        model_name = model_name or settings.GEMINI_MODEL
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        
+        with self._lock:
+            if model_name not in self._models:
+                # The SDK is imported on first real use so simulation-mode
+                # workers and management commands never load it.
+                import google.generativeai as genai
+                from .tools import get_aegis_tools
+                
+                if not self._configured:
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._configured = True
+                
+                self._models[model_name] = genai.GenerativeModel(
+                    model_name=model_name,
+                    tools=get_aegis_tools(),
+                    system_instruction=SYSTEM_INSTRUCTION
+                )
+                logger.info(f"Gemini model initialized: {model_name}")
+            return self._models[model_name]
+    
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._configured = False
+
+# Shared per worker process; sessions only hold their own chat
+model_registry = ModelRegistry()
+
+def build_function_responses(outcomes):
+    import google.generativeai as genai
+    
+    return [
+        genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=outcome["name"],
+                response=outcome["response"]
+            )
+        )
+        for outcome in outcomes
+    ]
+
+class GeminiClient:
     
-    def _get_tools(self):
-        from .tools import AEGIS_TOOLS
-        return AEGIS_TOOLS
+    def __init__(self):
+        self.chat = None
+        
+        if not settings.GEMINI_API_KEY:
+            logger.warning("GEMINI_API_KEY not set. Using simulation mode.")
+            self.enabled = False
+            return
+        
+        try:
+            self.model = model_registry.get_model()
+            self.enabled = True
+        except Exception as e:
+            logger.error(f"Failed to initialize Gemini client: {e}")
+            self.enabled = False
     
     def start_chat(self, history=None):
         if not self.enabled:
@@ -76,8 +119,29 @@ Remember: Lives may depend on your accurate and timely analysis."""
             logger.error(f"Gemini API error: {e}")
             raise
     
+    async def send_message_async(self, message, stream=False, tool_config=None):
+        if not self.enabled:
+            raise Exception("Gemini client not enabled. Check API key configuration.")
+        
+        if not self.chat:
+            self.start_chat()
+        
+        try:
+            response = await self.chat.send_message_async(message, stream=stream, tool_config=tool_config)
+            logger.debug(f"Received response from Gemini")
+            return response
+        except Exception as e:
+            logger.error(f"Gemini API error: {e}")
+            raise
+    
     def get_history(self):
         return self.chat.history if self.chat else []
     
+    def set_history(self, history):
+        if not self.chat:
+            self.start_chat(history=history)
+        else:
+            self.chat.history = history
+    
     def is_enabled(self):
         return self.enabled
@@ -0,0 +1,158 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "[Session summary of earlier monitoring]"
+SUMMARY_ACK = "Understood. Continuing to monitor with this context."
+MEDIA_PLACEHOLDER = "[media omitted]"
+
+def _content_role(content):
+    if isinstance(content, dict):
+        return content.get("role")
+    return getattr(content, 'role', None)
+
+def _content_parts(content):
+    if isinstance(content, dict):
+        return content.get("parts", [])
+    return getattr(content, 'parts', [])
+
+def _part_text(part):
+    if isinstance(part, str):
+        return part
+    if isinstance(part, dict):
+        return part.get("text", "")
+    return getattr(part, 'text', "") or ""
+
+def _part_function_name(part):
+    if isinstance(part, dict):
+        call = part.get("function_call")
+        return call.get("name") if call else None
+    call = getattr(part, 'function_call', None)
+    return call.name if call else None
+
+def _part_has_media(part):
+    if isinstance(part, str):
+        return False
+    if isinstance(part, dict):
+        return "inline_data" in part or "mime_type" in part
+    return bool(getattr(part, 'inline_data', None))
+
+def strip_media(history):
+    """
+    Returns `(history, changed)` with inline image/audio parts replaced by
+    MEDIA_PLACEHOLDER. Media is only worth its tokens on the turn that
+    sent it; left in the chat it would be resent with every later request
+    while counting as zero towards the token budget.
+    """
+    stripped, changed = [], False
+    for content in history:
+        parts = _content_parts(content)
+        if not any(_part_has_media(part) for part in parts):
+            stripped.append(content)
+            continue
+        stripped.append({
+            "role": _content_role(content),
+            "parts": [MEDIA_PLACEHOLDER if _part_has_media(part) else part for part in parts]
+        })
+        changed = True
+    return stripped, changed
+
+def content_text(content):
+    return "".join(_part_text(part) for part in _content_parts(content))
+
+def estimate_tokens(contents):
+    # ~4 characters per token is close enough for budgeting
+    return sum(len(content_text(c)) for c in contents) // 4 + 4 * len(contents)
+
+class ConversationWindow:
+    """
+    Keeps a chat history bounded: the last `max_turns` turns stay verbatim,
+    older turns are folded into a short extractive summary, and recent turns
+    are folded further while the history exceeds `token_budget`.
+    """
+
+    def __init__(self, max_turns=20, token_budget=8000, summary_chars=2000, line_chars=160):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_chars = summary_chars
+        self.line_chars = line_chars
+        self.summary_lines = []
+
+    def compact(self, history):
+        """
+        Returns `(history, changed)` with the window applied.
+        """
+        turns = self._split_turns(self._strip_summary(history))
+        folded = 0
+
+        while len(turns) > self.max_turns:
+            self._fold(turns.pop(0))
+            folded += 1
+
+        while len(turns) > 1 and estimate_tokens(self._flatten(turns)) + self._summary_tokens() > self.token_budget:
+            self._fold(turns.pop(0))
+            folded += 1
+
+        if not folded:
+            return history, False
+
+        logger.debug(f"Folded {folded} turns into the session summary")
+        return self.summary_contents() + self._flatten(turns), True
+
+    def summary_contents(self):
+        if not self.summary_lines:
+            return []
+        return [
+            {"role": "user", "parts": [SUMMARY_PREFIX + "\n" + "\n".join(self.summary_lines)]},
+            {"role": "model", "parts": [SUMMARY_ACK]},
+        ]
+
+    def _summary_tokens(self):
+        return sum(len(line) for line in self.summary_lines) // 4
+
+    def _strip_summary(self, history):
+        history = list(history)
+        if history and content_text(history[0]).startswith(SUMMARY_PREFIX):
+            return history[2:]
+        return history
+
+    def _split_turns(self, history):
+        turns = []
+        for content in history:
+            parts = _content_parts(content)
+            starts_turn = _content_role(content) == "user" and any(_part_text(p) for p in parts)
+            if starts_turn or not turns:
+                turns.append([])
+            turns[-1].append(content)
+        return turns
+
+    def _flatten(self, turns):
+        return [content for turn in turns for content in turn]
+
+    def _fold(self, turn):
+        user_text, model_text, tools = "", "", []
+        for content in turn:
+            for part in _content_parts(content):
+                name = _part_function_name(part)
+                if name:
+                    tools.append(name)
+                elif _content_role(content) == "user" and not user_text:
+                    user_text = _part_text(part)
+                elif _content_role(content) == "model":
+                    model_text += _part_text(part)
+
+        line = f"- Observed: {self._clip(user_text)}"
+        if tools:
+            line += f" | Tools: {', '.join(tools)}"
+        if model_text:
+            line += f" | AEGIS: {self._clip(model_text)}"
+        self.summary_lines.append(line)
+
+        while len(self.summary_lines) > 1 and sum(len(l) + 1 for l in self.summary_lines) > self.summary_chars:
+            self.summary_lines.pop(0)
+
+    def _clip(self, text):
+        text = " ".join(text.split())
+        if len(text) <= self.line_chars:
+            return text
+        return text[:self.line_chars - 3] + "..."
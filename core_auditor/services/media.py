@@ -0,0 +1,208 @@
+"""
+Camera frame ingestion: decoding, downsampling and near-duplicate
+suppression.
+
+Frames arrive as raw pixels ("image/x-raw-gray", "image/x-raw-rgb",
+"image/x-raw-rgba" with width and height), binary PGM/PPM, or JPEG/PNG
+when Pillow is installed. Each frame is reduced to a 64-bit difference
+hash; a FrameGate forwards a frame to the model only when its hash is
+far enough from the last forwarded frame of the same stream and the
+session is under its frame rate limit.
+"""
+import struct
+import time
+import zlib
+
+import numpy as np
+
+RAW_CHANNELS = {
+    "image/x-raw-gray": 1,
+    "image/x-raw-rgb": 3,
+    "image/x-raw-rgba": 4,
+}
+NETPBM_CHANNELS = {b"P5": 1, b"P6": 3}
+PILLOW_MIMES = ("image/jpeg", "image/png", "image/webp")
+
+FORWARDED = "forwarded"
+DUPLICATE = "duplicate"
+RATE_LIMITED = "rate_limited"
+
+class MediaError(ValueError):
+    pass
+
+def is_image(mime):
+    return bool(mime) and mime.startswith("image/")
+
+def decode_frame(data, mime, width=None, height=None):
+    """
+    Returns the frame as an (height, width, channels) uint8 array.
+    """
+    if mime in RAW_CHANNELS:
+        return _decode_raw(data, RAW_CHANNELS[mime], width, height)
+    if mime in ("image/x-portable-graymap", "image/x-portable-pixmap", "image/x-portable-anymap"):
+        return _decode_netpbm(data)
+    if mime in PILLOW_MIMES:
+        return _decode_pillow(data)
+    raise MediaError(f"Unsupported frame type: {mime}")
+
+def _decode_raw(data, channels, width, height):
+    try:
+        width, height = int(width), int(height)
+    except (TypeError, ValueError):
+        raise MediaError("Raw frames need integer width and height")
+    if width <= 0 or height <= 0 or len(data) != width * height * channels:
+        raise MediaError(f"Raw frame of {len(data)} bytes does not match {width}x{height}x{channels}")
+    return np.frombuffer(data, dtype=np.uint8).reshape(height, width, channels)
+
+def _decode_netpbm(data):
+    # Header: magic, width, height, maxval separated by whitespace, then
+    # one whitespace byte before the pixels. Comments are not supported.
+    fields, offset = [], 0
+    while len(fields) < 4:
+        while offset < len(data) and data[offset:offset + 1].isspace():
+            offset += 1
+        end = offset
+        while end < len(data) and not data[end:end + 1].isspace():
+            end += 1
+        if end == offset:
+            raise MediaError("Truncated PGM/PPM header")
+        fields.append(data[offset:end])
+        offset = end
+    offset += 1
+
+    magic = fields[0]
+    if magic not in NETPBM_CHANNELS:
+        raise MediaError("Only binary PGM (P5) and PPM (P6) frames are supported")
+    try:
+        width, height, maxval = (int(field) for field in fields[1:])
+    except ValueError:
+        raise MediaError("Invalid PGM/PPM header")
+    if maxval != 255:
+        raise MediaError("Only 8-bit PGM/PPM frames are supported")
+    return _decode_raw(data[offset:], NETPBM_CHANNELS[magic], width, height)
+
+def _decode_pillow(data):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise MediaError("JPEG/PNG frames need Pillow; send raw or PGM/PPM frames instead")
+    import io
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return np.asarray(image.convert("RGB"))
+    except Exception as e:
+        raise MediaError(f"Could not decode frame: {e}")
+
+def to_gray(frame):
+    if frame.shape[2] == 1:
+        return frame[:, :, 0].astype(np.float32)
+    # ITU-R BT.601 luma
+    rgb = frame[:, :, :3].astype(np.float32)
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+def area_resize(image, height, width):
+    """
+    Downsamples a 2-D (or 3-D) array by averaging the pixels that fall
+    into each output cell. Frames smaller than the target are first
+    repeated up to it.
+    """
+    rows = np.linspace(0, image.shape[0], height + 1).astype(int)
+    cols = np.linspace(0, image.shape[1], width + 1).astype(int)
+    if image.shape[0] < height or image.shape[1] < width:
+        image = np.repeat(np.repeat(image, -(-height // image.shape[0]), axis=0), -(-width // image.shape[1]), axis=1)
+        rows = np.linspace(0, image.shape[0], height + 1).astype(int)
+        cols = np.linspace(0, image.shape[1], width + 1).astype(int)
+    summed = np.add.reduceat(np.add.reduceat(image.astype(np.float32), rows[:-1], axis=0), cols[:-1], axis=1)
+    counts = np.outer(np.diff(rows), np.diff(cols))
+    if summed.ndim == 3:
+        counts = counts[:, :, None]
+    return summed / counts
+
+def dhash(frame, hash_size=8):
+    """
+    Difference hash: the frame is shrunk to hash_size x (hash_size + 1)
+    grayscale cells and each bit records whether a cell is brighter than
+    its right-hand neighbour. Lighting drift and sensor noise leave most
+    bits alone; people or instruments moving flip many of them.
+    """
+    cells = area_resize(to_gray(frame), hash_size, hash_size + 1)
+    bits = (cells[:, 1:] > cells[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+def encode_png(frame):
+    """
+    Minimal 8-bit grayscale/RGB PNG encoder so frames can be handed to
+    the model without an imaging library.
+    """
+    height, width, channels = frame.shape
+    if channels == 4:
+        frame, channels = frame[:, :, :3], 3
+    color_type = 0 if channels == 1 else 2
+    rows = np.ascontiguousarray(frame, dtype=np.uint8).reshape(height, width * channels)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+def fingerprint(data, mime, width=None, height=None, max_side=512):
+    """
+    Decodes a frame and returns (hash, frame) where frame is decimated to
+    roughly max_side on its longest side. Cheap enough to run per frame;
+    the expensive encode in frame_part only runs for forwarded frames.
+    """
+    frame = decode_frame(data, mime, width, height)
+    # Strided decimation first so the float work only touches a few
+    # hundred thousand pixels even for 1080p/4K sources.
+    step = max(frame.shape[:2]) // max_side
+    if step > 1:
+        frame = frame[::step, ::step]
+    return dhash(frame), frame
+
+def frame_part(frame, max_side=512):
+    """
+    The frame as a model part: a PNG no larger than max_side on its
+    longest side.
+    """
+    longest = max(frame.shape[:2])
+    if longest > max_side:
+        scale = max_side / longest
+        frame = area_resize(frame, max(1, round(frame.shape[0] * scale)), max(1, round(frame.shape[1] * scale)))
+        frame = np.clip(frame + 0.5, 0, 255).astype(np.uint8)
+    return {"mime_type": "image/png", "data": encode_png(frame)}
+
+class FrameGate:
+    """
+    Per-session admission for camera frames. A frame is forwarded when it
+    differs from the last forwarded frame of its stream by more than
+    `min_distance` hash bits and at least 1 / max_fps seconds have passed
+    since the session last forwarded a frame.
+    """
+
+    def __init__(self, max_fps=1.0, min_distance=6):
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.min_distance = min_distance
+        self.last_hashes = {}
+        self.last_forwarded = None
+
+    def offer(self, stream_id, frame_hash, now=None):
+        now = time.monotonic() if now is None else now
+        previous = self.last_hashes.get(stream_id)
+        if previous is not None and hamming(previous, frame_hash) <= self.min_distance:
+            return DUPLICATE
+        if self.last_forwarded is not None and now - self.last_forwarded < self.min_interval:
+            return RATE_LIMITED
+
+        self.last_hashes[stream_id] = frame_hash
+        self.last_forwarded = now
+        return FORWARDED
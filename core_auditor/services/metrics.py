@@ -0,0 +1,222 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format (0.0.4).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "aegis_stage_duration_seconds", "Time spent in each stage of an audit turn.", ["stage"]
+))
+TOOL_SECONDS = registry.register(Histogram(
+    "aegis_tool_duration_seconds", "Tool execution time.", ["tool"]
+))
+TURN_SECONDS = registry.register(Histogram(
+    "aegis_turn_duration_seconds", "End-to-end audit turn latency.", ["mode"]
+))
+TURNS = registry.register(Counter("aegis_turns_total", "Audit turns completed.", ["mode"]))
+ACTIVE_SESSIONS = registry.register(Gauge("aegis_active_sessions", "Connected auditor WebSocket sessions."))
+MODEL_CALLS_IN_FLIGHT = registry.register(Gauge("aegis_model_calls_in_flight", "Gemini requests awaiting a response."))
+TOOL_CALLS = registry.register(Counter("aegis_tool_calls_total", "Tool calls executed.", ["tool"]))
+TOOL_ERRORS = registry.register(Counter("aegis_tool_errors_total", "Tool calls that failed or timed out.", ["tool"]))
+DEVIATIONS = registry.register(Counter("aegis_deviations_total", "Deviations persisted.", ["severity"]))
+MEDIA_FRAMES = registry.register(Counter(
+    "aegis_media_frames_total", "Camera frames received, by admission outcome.", ["outcome"]
+))
+BATCH_MESSAGES = registry.register(Histogram(
+    "aegis_batch_messages", "Text messages coalesced into each batched turn.", buckets=(1, 2, 3, 5, 8, 13, 21)
+))
+RESPONSE_CACHE = registry.register(Counter(
+    "aegis_response_cache_total", "Response cache lookups and rejected stores.", ["outcome"]
+))
+SESSION_RESUMES = registry.register(Counter(
+    "aegis_session_resumes_total", "Reconnects asking to resume a session, by outcome.", ["outcome"]
+))
+AUDIO_SECONDS = registry.register(Counter(
+    "aegis_audio_seconds_total", "Audio received and forwarded to the model, in seconds.", ["stage"]
+))
+
+_current_trace = contextvars.ContextVar("aegis_turn_trace", default=None)
+
+class TurnTrace:
+    """
+    Per-turn breakdown of stage timings. Spans opened while a trace is
+    active (including in tasks spawned from it) add their duration here,
+    so a slow turn can be attributed to the stage that took the time.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def stages_ms(self):
+        return {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+
+    def slowest(self):
+        if not self.stages:
+            return None
+        return max(self.stages, key=self.stages.get)
+
+@contextmanager
+def trace_turn():
+    trace = TurnTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def record(stage, seconds, tool=None):
+    """
+    Adds `seconds` to the stage histogram (and the tool histogram when
+    `tool` is given) and to the active TurnTrace, if any.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if tool is not None:
+        TOOL_SECONDS.observe(seconds, tool=tool)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(f"{stage}.{tool}" if tool else stage, seconds)
+
+@contextmanager
+def span(stage, tool=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, tool=tool)
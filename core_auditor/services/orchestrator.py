@@ -1,16 +1,37 @@
+import asyncio
 import json
 import logging
-from .gemini_client import GeminiClient
-from .tools import log_deviation, search_knowledge_vault
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .gemini_client import GeminiClient, build_function_responses
+from .history import ConversationWindow, strip_media
+from .metrics import MODEL_CALLS_IN_FLIGHT, RESPONSE_CACHE, TOOL_CALLS, TOOL_ERRORS, record, span
+from .response_cache import context_digest, normalize_input, response_cache
+from .rules import get_rule_engine
+from .sessions import serialize_history
+from .tools import alog_deviation, log_deviation, search_knowledge_vault
 
 logger = logging.getLogger(__name__)
 
+NO_FUNCTION_CALLS = {"function_calling_config": {"mode": "NONE"}}
+PRESCREEN_NOTE = "\n\n[Aegis pre-screen already logged: {logged}. Do not log these again.]"
+
 class AuditorOrchestrator:
     
-    def __init__(self):
+    def __init__(self, session_id=None):
         self.gemini = GeminiClient()
+        self.session_id = session_id
         self.history = []
         self.thought_signature = None
+        # Optional coroutine function (args, error) called when a deviation
+        # write already reported to the model as pending fails later.
+        self.on_deviation_failed = None
+        self.window = ConversationWindow(
+            max_turns=settings.AEGIS_HISTORY_MAX_TURNS,
+            token_budget=settings.AEGIS_HISTORY_TOKEN_BUDGET,
+            summary_chars=settings.AEGIS_HISTORY_SUMMARY_CHARS
+        )
         
         if self.gemini.is_enabled():
             self.gemini.start_chat()
@@ -18,76 +39,328 @@ class AuditorOrchestrator:
         else:
             logger.warning("AuditorOrchestrator running in simulation mode (no API key)")
     
+    def snapshot(self):
+        """
+        The session's compacted state as plain JSON: chat history (already
+        folded by the window), the window summary and the last thought
+        signature.
+        """
+        history = self.gemini.get_history() if self.gemini.is_enabled() else self.history
+        return {
+            "history": serialize_history(history),
+            "summary_lines": list(self.window.summary_lines),
+            "thought_signature": self.thought_signature
+        }
+    
+    def restore(self, state):
+        self.window.summary_lines = list(state.get("summary_lines", []))
+        self.thought_signature = state.get("thought_signature")
+        history = state.get("history", [])
+        if self.gemini.is_enabled():
+            self.gemini.start_chat(history=history)
+        else:
+            self.history = history
+    
     def process_input(self, input_text, modality="text"):
         if not self.gemini.is_enabled():
             return self._simulate_response(input_text)
         
         try:
             response = self.gemini.send_message(input_text)
+            return self._build_result(response)
             
-            result = {
-                "content": "",
-                "thought_signature": self._extract_thought_signature(response),
-                "tool_use": None
-            }
+        except Exception as e:
+            logger.error(f"Error processing input with Gemini: {e}")
+            import traceback
+            traceback.print_exc()
+            return self._error_result(e)
+    
+    async def arespond(self, input_text, modality="text", stream=False, media=None):
+        """
+        Runs a full turn: generates, executes every requested tool call
+        concurrently, feeds the function responses back to the model and
+        repeats for at most AEGIS_MAX_TOOL_ROUNDS follow-up generations.
+        `media` is a list of {"mime_type", "data"} parts sent alongside
+        `input_text` for non-text modalities.
+        Yields ("delta", text) as model text arrives, then ("result", result).
+        """
+        cache_key = self._cache_key(input_text, modality, media)
+        if cache_key is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                RESPONSE_CACHE.inc(outcome="hit")
+                result = self._copy_result(cached)
+                yield ("delta", result["content"])
+                yield ("result", result)
+                return
+            RESPONSE_CACHE.inc(outcome="miss")
+        
+        async for event in self._arespond(input_text, stream, media):
+            if event[0] == "result" and cache_key is not None:
+                self._cache_result(cache_key, event[1])
+            yield event
+    
+    async def _arespond(self, input_text, stream, media):
+        if not self.gemini.is_enabled():
+            with span("simulate"):
+                result = self._simulate_response(input_text)
+            yield ("delta", result["content"])
+            await self._arun_tool_calls(result, result["tool_calls"])
+            yield ("result", result)
+            return
+        
+        result = self._new_result()
+        message = input_text
+        max_rounds = settings.AEGIS_MAX_TOOL_ROUNDS
+        history = list(self.gemini.get_history())
+        
+        try:
+            prescreened = await self._aprescreen(result, input_text)
+            if prescreened:
+                message += PRESCREEN_NOTE.format(logged="; ".join(
+                    f"[{call['args']['severity']}] {call['args']['description']}" for call in prescreened
+                ))
+            if media:
+                message = [message, *media]
             
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
+            for round_number in range(max_rounds + 1):
+                turn = self._new_result()
+                separator = "\n\n" if result["content"] else ""
+                tool_config = NO_FUNCTION_CALLS if round_number == max_rounds else None
                 
-                if hasattr(candidate, 'content') and candidate.content:
-                    if hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call:
-                                func_call = part.function_call
-                                result["tool_use"] = {
-                                    "name": func_call.name,
-                                    "args": dict(func_call.args) if hasattr(func_call, 'args') else {}
-                                }
-                                logger.info(f"Function call requested: {func_call.name}")
-                                continue
-                            
-                            if hasattr(part, 'text'):
-                                result["content"] += part.text
-            
-            if not result["content"] and not result["tool_use"]:
+                MODEL_CALLS_IN_FLIGHT.inc()
                 try:
-                    if hasattr(response, 'text'):
-                        result["content"] = response.text
-                except ValueError as e:
-                    logger.debug(f"No text content in response (function call only): {e}")
-                    if not result["tool_use"]:
-                        result["content"] = "Processing your request..."
+                    started = time.perf_counter()
+                    response = await self.gemini.send_message_async(message, stream=stream, tool_config=tool_config)
+                    
+                    if stream:
+                        async for chunk in self._atimed_chunks(response, time.perf_counter() - started):
+                            with span("response_parse"):
+                                delta = self._collect_parts(chunk, turn)
+                            if delta:
+                                yield ("delta", separator + delta)
+                                separator = ""
+                    else:
+                        record("model_call", time.perf_counter() - started)
+                        with span("response_parse"):
+                            delta = self._collect_parts(response, turn)
+                        if delta:
+                            yield ("delta", separator + delta)
+                finally:
+                    MODEL_CALLS_IN_FLIGHT.dec()
+                
+                if turn["content"]:
+                    result["content"] += ("\n\n" if result["content"] else "") + turn["content"]
+                result["thought_signature"] = self._extract_thought_signature(response)
+                
+                if not turn["tool_calls"]:
+                    break
+                
+                result["tool_calls"].extend(turn["tool_calls"])
+                outcomes = await self._arun_tool_calls(result, turn["tool_calls"])
+                message = build_function_responses(outcomes)
             
+            if not result["content"] and not result["tool_results"]:
+                result["content"] = "Processing your request..."
+            
+            result["tool_use"] = result["tool_calls"][0] if result["tool_calls"] else None
             self.thought_signature = result["thought_signature"]
+            self._compact_history()
             
-            return result
+            yield ("result", result)
             
         except Exception as e:
-            logger.error(f"Error processing input with Gemini: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "content": f"Error communicating with AI: {str(e)}",
-                "thought_signature": None,
-                "tool_use": None
-            }
+            logger.error(f"Error running turn with Gemini: {e}")
+            # A round that failed after a function call leaves the call
+            # without its response, which the API rejects on every later
+            # turn (and the session snapshot would keep). Drop the turn.
+            self.gemini.set_history(history)
+            error = self._error_result(e)
+            error["error"] = True
+            error["tool_calls"] = result["tool_calls"]
+            error["tool_results"] = result["tool_results"]
+            yield ("result", error)
+    
+    def _cache_key(self, input_text, modality, media):
+        if not settings.AEGIS_RESPONSE_CACHE or media or modality != "text":
+            return None
+        scope = self.session_id if settings.AEGIS_RESPONSE_CACHE_SCOPE == "session" else None
+        # Only settings that change how an input is answered go into the
+        # context. The conversation itself is left out on purpose: every
+        # turn extends it, so keying on it would make repeats always miss.
+        context = context_digest(
+            scope,
+            settings.GEMINI_MODEL if self.gemini.is_enabled() else "simulation",
+            settings.AEGIS_RULES_PATH,
+            settings.AEGIS_PRESCREEN_MIN_SEVERITY
+        )
+        return (context, normalize_input(input_text))
+    
+    def _cache_result(self, key, result):
+        # A cached answer would skip the tool call, so turns that logged a
+        # deviation must always reach the model (and the database) again.
+        if result.get("error") or any(call["name"] == "log_deviation" for call in result["tool_calls"]):
+            RESPONSE_CACHE.inc(outcome="uncacheable")
+            return
+        response_cache.set(key, self._copy_result(result))
+    
+    def _copy_result(self, result):
+        return {**result, "tool_calls": list(result["tool_calls"]), "tool_results": list(result["tool_results"])}
+    
+    async def _atimed_chunks(self, response, waited):
+        # Time spent waiting on the stream counts towards the model call,
+        # recorded once the stream is drained.
+        chunks = response.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    waited += time.perf_counter() - started
+                yield chunk
+        finally:
+            record("model_call", waited)
     
     def execute_tool(self, tool_name, args):
         try:
             if tool_name == "log_deviation":
-                tool_result = log_deviation(**args)
-                severity = args.get('severity', 'UNKNOWN').upper()
-                description = args.get('description', 'No description')
-                action = args.get('recommended_action', 'No action specified')
-                
-                severity_emoji = {
-                    'LOW': '⚠️',
-                    'MEDIUM': '⚠️',
-                    'HIGH': '🚨',
-                    'CRITICAL': '🔴'
-                }.get(severity, '⚠️')
-                
+                tool_result = log_deviation(**args, session_id=self.session_id)
+            elif tool_name == "search_knowledge_vault":
+                tool_result = search_knowledge_vault(**args)
+            else:
+                logger.error(f"Unknown tool requested: {tool_name}")
+                return f"❌ Error: Unknown tool '{tool_name}'"
+            
+            return self._format_tool_result(tool_name, args, tool_result)
+            
+        except Exception as e:
+            logger.error(f"Error executing tool {tool_name}: {e}")
+            return f"❌ Tool execution error: {str(e)}"
+    
+    async def _adispatch_tool(self, tool_name, args):
+        if tool_name == "log_deviation":
+            return await alog_deviation(**args, session_id=self.session_id)
+        if tool_name == "search_knowledge_vault":
+            return await sync_to_async(search_knowledge_vault, thread_sensitive=False)(**args)
+        return None
+    
+    async def ascreen(self, input_text):
+        """
+        Logs a deviation for the strongest screening rule matching
+        `input_text` without consulting the model, for text that will never
+        get a turn (messages still batched when the socket closed).
+        """
+        result = self._new_result()
+        calls = [call for _, call in get_rule_engine().tool_calls(input_text) if call["name"] == "log_deviation"]
+        if calls:
+            result["tool_calls"].extend(calls)
+            await self._arun_tool_calls(result, calls)
+        return result
+    
+    async def _aprescreen(self, result, input_text):
+        """
+        Logs deviations for screening rules at or above
+        AEGIS_PRESCREEN_MIN_SEVERITY before the model is consulted.
+        """
+        min_severity = settings.AEGIS_PRESCREEN_MIN_SEVERITY
+        if not min_severity:
+            return []
+        
+        calls = [call for _, call in get_rule_engine().tool_calls(input_text, min_severity=min_severity.upper())]
+        if calls:
+            result["tool_calls"].extend(calls)
+            await self._arun_tool_calls(result, calls)
+        return calls
+    
+    async def _arun_tool_calls(self, result, calls):
+        outcomes = await asyncio.gather(*[self._arun_tool_call(call) for call in calls])
+        result["tool_results"].extend(outcome["display"] for outcome in outcomes)
+        return outcomes
+    
+    async def _arun_tool_call(self, call):
+        tool_name, args = call["name"], call["args"]
+        logger.info(f"Executing tool: {tool_name} with args: {args}")
+        TOOL_CALLS.inc(tool=tool_name)
+        
+        dispatch = self._adispatch_tool(tool_name, args)
+        if tool_name == "log_deviation":
+            # A timed-out wait must not cancel the write: the row would be
+            # committed anyway and the model, told the call failed, would
+            # log it a second time.
+            write = asyncio.ensure_future(dispatch)
+            dispatch = asyncio.shield(write)
+        
+        try:
+            with span("tool", tool=tool_name):
+                tool_result = await asyncio.wait_for(dispatch, timeout=settings.AEGIS_TOOL_TIMEOUT)
+            if tool_result is None:
+                logger.error(f"Unknown tool requested: {tool_name}")
+                TOOL_ERRORS.inc(tool=tool_name)
+                tool_result = {"error": f"Unknown tool: {tool_name}"}
+                display = f"❌ Error: Unknown tool '{tool_name}'"
+            else:
+                if tool_result.get("error"):
+                    TOOL_ERRORS.inc(tool=tool_name)
+                display = self._format_tool_result(tool_name, args, tool_result)
+        except asyncio.TimeoutError:
+            if tool_name == "log_deviation":
+                logger.warning(f"Deviation write still pending after {settings.AEGIS_TOOL_TIMEOUT}s")
+                write.add_done_callback(lambda task: self._pending_write_done(task, args))
+                tool_result = {"status": "pending", "message": "Deviation accepted; the write is still in progress. Do not log it again."}
+                display = self._format_tool_result(tool_name, args, tool_result)
+            else:
+                logger.error(f"Tool {tool_name} timed out after {settings.AEGIS_TOOL_TIMEOUT}s")
+                TOOL_ERRORS.inc(tool=tool_name)
+                tool_result = {"error": "Tool execution timed out"}
+                display = f"❌ Tool execution timed out: {tool_name}"
+        except Exception as e:
+            logger.error(f"Error executing tool {tool_name}: {e}")
+            TOOL_ERRORS.inc(tool=tool_name)
+            tool_result = {"error": str(e)}
+            display = f"❌ Tool execution error: {str(e)}"
+        
+        return {"name": tool_name, "args": args, "response": tool_result, "display": display}
+    
+    def _pending_write_done(self, task, args):
+        error = "cancelled" if task.cancelled() else task.exception()
+        if error is None:
+            return
+        logger.error(f"Pending deviation write failed: {error}")
+        TOOL_ERRORS.inc(tool="log_deviation")
+        if self.on_deviation_failed is not None:
+            asyncio.ensure_future(self.on_deviation_failed(args, str(error)))
+    
+    def _format_tool_result(self, tool_name, args, tool_result):
+        if tool_result.get('error'):
+            return f"❌ Tool execution error: {tool_result['error']}"
+        
+        if tool_name == "log_deviation":
+            severity = args.get('severity', 'UNKNOWN').upper()
+            description = args.get('description', 'No description')
+            action = args.get('recommended_action', 'No action specified')
+            
+            severity_emoji = {
+                'LOW': '⚠️',
+                'MEDIUM': '⚠️',
+                'HIGH': '🚨',
+                'CRITICAL': '🔴'
+            }.get(severity, '⚠️')
+            
+            if tool_result.get('status') == 'pending':
                 return f"""
+{severity_emoji} **SAFETY DEVIATION ACCEPTED**
+
+**Severity:** {severity}
+**Issue:** {description}
+**Action Required:** {action}
+
+**Record:** write in progress
+"""
+            
+            return f"""
 {severity_emoji} **SAFETY DEVIATION LOGGED**
 
 **Severity:** {severity}
@@ -97,15 +370,13 @@ class AuditorOrchestrator:
 **Record ID:** #{tool_result.get('id')}
 **Logged at:** {tool_result.get('timestamp', 'N/A')[:19].replace('T', ' ')}
 """
-            
-            elif tool_name == "search_knowledge_vault":
-                tool_result = search_knowledge_vault(**args)
-                query = args.get('query', 'Unknown query')
-                results = tool_result.get('results', [])
-                
-                formatted_results = "\\n".join([f"  • {r}" for r in results])
-                
-                return f"""
+        
+        query = args.get('query', 'Unknown query')
+        results = tool_result.get('results', [])
+        
+        formatted_results = "\n".join([f"  • {r}" for r in results]) or "  • No matching protocols found."
+        
+        return f"""
 📚 **KNOWLEDGE VAULT SEARCH**
 
 **Query:** {query}
@@ -113,15 +384,76 @@ class AuditorOrchestrator:
 **Relevant Protocols:**
 {formatted_results}
 """
+    
+    def _build_result(self, response):
+        result = self._new_result()
+        result["thought_signature"] = self._extract_thought_signature(response)
+        
+        self._collect_parts(response, result)
+        
+        if not result["content"] and not result["tool_calls"]:
+            try:
+                if hasattr(response, 'text'):
+                    result["content"] = response.text
+            except ValueError as e:
+                logger.debug(f"No text content in response (function call only): {e}")
+                if not result["tool_calls"]:
+                    result["content"] = "Processing your request..."
+        
+        self.thought_signature = result["thought_signature"]
+        self._compact_history()
+        
+        return result
+    
+    def _new_result(self):
+        return {
+            "content": "",
+            "thought_signature": None,
+            "tool_use": None,
+            "tool_calls": [],
+            "tool_results": []
+        }
+    
+    def _error_result(self, error):
+        result = self._new_result()
+        result["content"] = f"Error communicating with AI: {str(error)}"
+        return result
+    
+    def _collect_parts(self, response, result):
+        delta = ""
+        
+        if hasattr(response, 'candidates') and response.candidates:
+            candidate = response.candidates[0]
             
-            else:
-                tool_result = {"error": f"Unknown tool: {tool_name}"}
-                logger.error(f"Unknown tool requested: {tool_name}")
-                return f"❌ Error: Unknown tool '{tool_name}'"
-            
-        except Exception as e:
-            logger.error(f"Error executing tool {tool_name}: {e}")
-            return f"❌ Tool execution error: {str(e)}"
+            if hasattr(candidate, 'content') and candidate.content:
+                if hasattr(candidate.content, 'parts'):
+                    for part in candidate.content.parts:
+                        if hasattr(part, 'function_call') and part.function_call:
+                            func_call = part.function_call
+                            call = {
+                                "name": func_call.name,
+                                "args": dict(func_call.args) if hasattr(func_call, 'args') else {}
+                            }
+                            result["tool_calls"].append(call)
+                            if result["tool_use"] is None:
+                                result["tool_use"] = call
+                            logger.info(f"Function call requested: {func_call.name}")
+                            continue
+                        
+                        if hasattr(part, 'text'):
+                            delta += part.text
+        
+        result["content"] += delta
+        return delta
+    
+    def _compact_history(self):
+        if self.gemini.is_enabled():
+            history, stripped = strip_media(self.gemini.get_history())
+            history, changed = self.window.compact(history)
+            if stripped or changed:
+                self.gemini.set_history(history)
+        else:
+            self.history, _ = self.window.compact(self.history)
     
     def _extract_thought_signature(self, response):
         try:
@@ -134,34 +466,19 @@ class AuditorOrchestrator:
     def _simulate_response(self, input_text):
         self.history.append({"role": "user", "parts": [input_text]})
         
-        response = {
-            "content": "",
-            "thought_signature": "sim_" + str(abs(hash(input_text)) % 1000000),
-            "tool_use": None
-        }
+        response = self._new_result()
+        response["thought_signature"] = "sim_" + str(abs(hash(input_text)) % 1000000)
 
-        if "unsafe" in input_text.lower() or "violation" in input_text.lower():
-            response["tool_use"] = {
-                "name": "log_deviation",
-                "args": {
-                    "severity": "High",
-                    "description": f"Detected potential safety violation in: {input_text}",
-                    "recommended_action": "Halt procedure immediately and inspect."
-                }
-            }
-            response["content"] = "⚠️ I have detected a critical safety risk and will log a deviation."
-        
-        elif "protocol" in input_text.lower():
-            response["tool_use"] = {
-                "name": "search_knowledge_vault",
-                "args": {"query": input_text}
-            }
-            response["content"] = "🔍 Consulting the Knowledge Vault for relevant protocols..."
-        
+        matches = get_rule_engine().tool_calls(input_text)
+        if matches:
+            response["content"] = matches[0][0].message or "⚠️ Screening rule matched."
+            response["tool_calls"] = [call for _, call in matches]
+            response["tool_use"] = response["tool_calls"][0]
         else:
             response["content"] = f"✅ Acknowledged. Monitoring stream: {input_text[:50]}..."
 
         self.thought_signature = response["thought_signature"]
         self.history.append({"role": "model", "parts": [response["content"]]})
+        self._compact_history()
         
         return response
@@ -0,0 +1,55 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+def normalize_input(text):
+    return " ".join(text.lower().split())
+
+def context_digest(*parts):
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+class ResponseCache:
+    """
+    Bounded LRU of turn results with a per-entry TTL. Shared by every
+    session in the worker; keys carry the session scope, so entries only
+    cross sessions when AEGIS_RESPONSE_CACHE_SCOPE is "global".
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or settings.AEGIS_RESPONSE_CACHE_SIZE
+        self.ttl = ttl or settings.AEGIS_RESPONSE_CACHE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Singleton instance
+response_cache = ResponseCache()
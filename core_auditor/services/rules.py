@@ -0,0 +1,226 @@
+import json
+import logging
+import re
+import threading
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_RANK = {"LOW": 0, "MEDIUM": 1, "HIGH": 2, "CRITICAL": 3}
+RULE_KINDS = ("keyword", "phrase", "regex")
+
+class Rule:
+    """
+    One screening rule: a keyword, phrase or regex mapped to a tool call.
+
+    Regex rules may name a literal `anchor` that must appear in the text;
+    the regex is then only evaluated when the automaton has seen it.
+    """
+
+    def __init__(self, rule_id, kind, pattern, tool, severity=None, description=None,
+                 recommended_action=None, message=None, anchor=None, priority=0):
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Rule {rule_id}: unknown kind '{kind}'")
+        if severity is not None and severity.upper() not in SEVERITY_RANK:
+            raise ValueError(f"Rule {rule_id}: unknown severity '{severity}'")
+
+        self.id = rule_id
+        self.kind = kind
+        self.pattern = pattern
+        self.tool = tool
+        self.severity = severity.upper() if severity else None
+        self.description = description
+        self.recommended_action = recommended_action
+        self.message = message
+        self.anchor = anchor.lower() if anchor else None
+        self.priority = priority
+        self.regex = re.compile(pattern, re.IGNORECASE) if kind == "regex" else None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["id"], data["kind"], data["pattern"], data["tool"],
+            severity=data.get("severity"),
+            description=data.get("description"),
+            recommended_action=data.get("recommended_action"),
+            message=data.get("message"),
+            anchor=data.get("anchor"),
+            priority=data.get("priority", 0)
+        )
+
+    @property
+    def rank(self):
+        return (SEVERITY_RANK.get(self.severity, -1), self.priority)
+
+    def tool_call(self, text, matched):
+        if self.tool == "log_deviation":
+            fields = {"text": text, "match": matched}
+            args = {
+                "severity": self.severity or "MEDIUM",
+                "description": (self.description or "Detected potential safety violation in: {text}").format(**fields),
+                "recommended_action": (self.recommended_action or "Inspect and confirm.").format(**fields)
+            }
+        else:
+            args = {"query": text}
+        return {"name": self.tool, "args": args}
+
+class RuleMatch:
+    def __init__(self, rule, start, end, text):
+        self.rule = rule
+        self.start = start
+        self.end = end
+        self.text = text
+
+def at_word_boundary(text, start, end):
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+class AhoCorasick:
+    """
+    Multi-pattern automaton over lowercase literals. Matching walks the
+    input once, so its cost is linear in the text length (plus the number
+    of hits) however many patterns are loaded.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for value, pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append((value, len(pattern)))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def iter(self, text):
+        """
+        Yields (value, start, end) for every pattern occurrence in `text`.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for value, length in output[state]:
+                yield value, i + 1 - length, i + 1
+
+class RuleEngine:
+    """
+    Compiles keyword, phrase and regex rules into one automaton and maps
+    the matches on an input to tool calls.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        literals = []
+        self._unanchored = []
+
+        for rule in self.rules:
+            if rule.kind == "regex":
+                if rule.anchor:
+                    literals.append((rule, rule.anchor))
+                else:
+                    self._unanchored.append(rule)
+            else:
+                literals.append((rule, " ".join(rule.pattern.lower().split())))
+
+        self.automaton = AhoCorasick(literals)
+        # Anchor-less regexes share a single alternation so the text is
+        # scanned once for all of them.
+        self._combined = None
+        if self._unanchored:
+            self._combined = re.compile(
+                "|".join(f"(?P<r{i}>{rule.pattern})" for i, rule in enumerate(self._unanchored)),
+                re.IGNORECASE
+            )
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(Rule.from_dict(entry) for entry in data["rules"])
+
+    def match(self, text):
+        """
+        Returns one RuleMatch per rule that fires on `text`, strongest first.
+        """
+        lowered = text.lower()
+        normalized = " ".join(lowered.split())
+        matches = {}
+        # Each anchored regex is searched once, even when its anchor occurs
+        # many times or the search fails; re-searching per occurrence is
+        # quadratic in the text length.
+        searched = set()
+
+        for rule, start, end in self.automaton.iter(normalized):
+            if rule.id in matches or rule.id in searched:
+                continue
+            if rule.kind == "regex":
+                searched.add(rule.id)
+                found = rule.regex.search(text)
+                if found:
+                    matches[rule.id] = RuleMatch(rule, found.start(), found.end(), found.group(0))
+            elif at_word_boundary(normalized, start, end):
+                matches[rule.id] = RuleMatch(rule, start, end, normalized[start:end])
+
+        if self._combined is not None:
+            for found in self._combined.finditer(text):
+                rule = self._unanchored[int(found.lastgroup[1:])]
+                if rule.id not in matches:
+                    matches[rule.id] = RuleMatch(rule, found.start(), found.end(), found.group(0))
+
+        return sorted(matches.values(), key=lambda m: m.rule.rank, reverse=True)
+
+    def tool_calls(self, text, min_severity=None):
+        """
+        Tool calls for `text`: the strongest matching deviation rule and the
+        first matching rule for each other tool. With `min_severity`, only
+        deviation rules at or above that level are considered.
+        """
+        threshold = SEVERITY_RANK[min_severity] if min_severity else None
+        calls, tools = [], set()
+
+        for match in self.match(text):
+            rule = match.rule
+            if threshold is not None and (rule.tool != "log_deviation" or SEVERITY_RANK.get(rule.severity, -1) < threshold):
+                continue
+            if rule.tool in tools:
+                continue
+            tools.add(rule.tool)
+            calls.append((rule, rule.tool_call(text, match.text)))
+        return calls
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_rule_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RuleEngine.from_file(settings.AEGIS_RULES_PATH)
+                logger.info(f"Loaded {len(_engine.rules)} screening rules from {settings.AEGIS_RULES_PATH}")
+    return _engine
@@ -0,0 +1,150 @@
+"""
+Session snapshots for resuming an auditor session after a reconnect.
+
+A snapshot is the orchestrator's compacted state (history already folded
+by the ConversationWindow, window summary, last thought signature)
+reduced to plain JSON and zlib-compressed. Stores keep only the latest
+snapshot per session, so any worker can rehydrate it.
+"""
+import json
+import os
+import re
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+
+from .history import MEDIA_PLACEHOLDER, _part_has_media
+
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+def is_session_id(value):
+    return bool(value) and bool(SESSION_ID_PATTERN.match(value))
+
+def _plain(value):
+    # Proto map/repeated composites to dicts and lists.
+    if hasattr(value, "items"):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) or (hasattr(value, "__iter__") and not isinstance(value, (str, bytes, dict))):
+        return [_plain(item) for item in value]
+    return value
+
+def _serialize_part(part):
+    if isinstance(part, str):
+        return part
+    if _part_has_media(part):
+        return MEDIA_PLACEHOLDER
+    if isinstance(part, dict):
+        return _plain(part)
+
+    call = getattr(part, "function_call", None)
+    if call and call.name:
+        return {"function_call": {"name": call.name, "args": _plain(call.args)}}
+    response = getattr(part, "function_response", None)
+    if response and response.name:
+        return {"function_response": {"name": response.name, "response": _plain(response.response)}}
+    return getattr(part, "text", "") or ""
+
+def serialize_history(contents):
+    """
+    Chat contents (SDK protos or the dicts used in simulation mode) as
+    plain {"role", "parts"} dicts. Text parts become strings and media
+    blobs are replaced by a placeholder to keep snapshots small.
+    """
+    history = []
+    for content in contents:
+        if isinstance(content, dict):
+            role, parts = content.get("role"), content.get("parts", [])
+        else:
+            role, parts = content.role, content.parts
+        history.append({"role": role, "parts": [_serialize_part(part) for part in parts]})
+    return history
+
+def encode_state(state):
+    return zlib.compress(json.dumps(state, separators=(",", ":"), default=str).encode("utf-8"), 6)
+
+def decode_state(data):
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8"))
+
+class DatabaseSessionStore:
+    """
+    Snapshots in the SessionSnapshot table of the default database.
+    """
+
+    def load(self, session_id, max_age):
+        from django.utils import timezone
+        from ..models import SessionSnapshot
+
+        snapshot = SessionSnapshot.objects.filter(
+            session_id=session_id,
+            updated_at__gte=timezone.now() - timedelta(seconds=max_age)
+        ).values_list("state", flat=True).first()
+        return decode_state(snapshot) if snapshot is not None else None
+
+    def save(self, session_id, state):
+        from ..models import SessionSnapshot
+
+        SessionSnapshot.objects.update_or_create(session_id=session_id, defaults={"state": encode_state(state)})
+
+    def purge(self, max_age):
+        from django.utils import timezone
+        from ..models import SessionSnapshot
+
+        deleted, _ = SessionSnapshot.objects.filter(
+            updated_at__lt=timezone.now() - timedelta(seconds=max_age)
+        ).delete()
+        return deleted
+
+class FileSessionStore:
+    """
+    One `<session_id>.json.z` file per session under `directory`; writes
+    go through a temporary file and an atomic rename. Workers sharing the
+    directory share sessions.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json.z")
+
+    def load(self, session_id, max_age):
+        path = self._path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                return None
+            with open(path, "rb") as f:
+                return decode_state(f.read())
+        except FileNotFoundError:
+            return None
+
+    def save(self, session_id, state):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(session_id)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(encode_state(state))
+        os.replace(temp_path, path)
+
+    def purge(self, max_age):
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff, deleted = time.time() - max_age, 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".json.z") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                deleted += 1
+        return deleted
+
+def build_session_store(name, **options):
+    if not name:
+        return None
+    if name == "db":
+        return DatabaseSessionStore()
+    if name == "file":
+        return FileSessionStore(options["directory"])
+    raise ValueError(f"Unknown session store: {name}")
+
+session_store = build_session_store(settings.AEGIS_SESSION_STORE, directory=settings.AEGIS_SESSION_DIR)
@@ -1,64 +1,140 @@
+import threading
 from datetime import datetime
+from django.conf import settings
+from analytics.deviation_writer import deviation_writer
+from analytics.feed import abroadcast_deviation, broadcast_deviation
 from analytics.models import Deviation
-import google.generativeai as genai
+from analytics.pipeline import analytics_pipeline
+from knowledge_vault.ingest import search_vault
+from .metrics import DEVIATIONS, span
 
-def log_deviation(severity, description, recommended_action):
-    deviation = Deviation.objects.create(
-        severity=severity.upper(),
-        description=description,
-        recommended_action=recommended_action
-    )
+SEVERITIES = [value for value, _ in Deviation.SEVERITY_CHOICES]
+
+def _severity_error(severity):
+    # Returned to the model as the function response so it can retry.
+    if severity.upper() in SEVERITIES:
+        return None
+    return {"status": "error", "error": f"Unknown severity '{severity}'; use one of {', '.join(SEVERITIES)}"}
+
+def log_deviation(severity, description, recommended_action, session_id=None):
+    error = _severity_error(severity)
+    if error:
+        return error
+    with span("db_write"):
+        deviation = deviation_writer.write(
+            severity=severity.upper(),
+            description=description,
+            recommended_action=recommended_action,
+            session_id=session_id
+        )
+    DEVIATIONS.inc(severity=deviation.severity)
     print(f"[ANALYTICS] Deviation Logged: [{severity}] {description} -> {recommended_action}")
+    _export_deviation(deviation)
+    broadcast_deviation(deviation)
     return {"status": "success", "id": str(deviation.id), "timestamp": deviation.timestamp.isoformat()}
 
+async def alog_deviation(severity, description, recommended_action, session_id=None):
+    error = _severity_error(severity)
+    if error:
+        return error
+    with span("db_write"):
+        deviation = await deviation_writer.awrite(
+            severity=severity.upper(),
+            description=description,
+            recommended_action=recommended_action,
+            session_id=session_id
+        )
+    DEVIATIONS.inc(severity=deviation.severity)
+    print(f"[ANALYTICS] Deviation Logged: [{severity}] {description} -> {recommended_action}")
+    _export_deviation(deviation)
+    await abroadcast_deviation(deviation)
+    return {"status": "success", "id": str(deviation.id), "timestamp": deviation.timestamp.isoformat()}
+
+def _export_deviation(deviation):
+    analytics_pipeline.enqueue("deviations", {
+        "id": deviation.id,
+        "timestamp": deviation.timestamp.isoformat(),
+        "severity": deviation.severity,
+        "description": deviation.description,
+        "recommended_action": deviation.recommended_action,
+        "session_id": deviation.session_id
+    })
+
 def search_knowledge_vault(query):
     print(f"[KNOWLEDGE VAULT] Searching for: {query}")
+    passages = search_vault(
+        query,
+        top_k=settings.KNOWLEDGE_VAULT_TOP_K,
+        mode=settings.KNOWLEDGE_VAULT_SEARCH_MODE
+    )
     return {
-        "results": [
-            "Standard Operating Procedure 4.2.1: Always wear protective eyewear.",
-            "IEC 60601-1: Medical electrical equipment safety standards."
-        ]
+        "results": [p["text"] for p in passages],
+        "sources": [p["source"] for p in passages]
     }
 
-AEGIS_TOOLS = [
-    genai.protos.Tool(
-        function_declarations=[
-            genai.protos.FunctionDeclaration(
-                name="log_deviation",
-                description="Logs a detected safety deviation or regulatory non-conformance to the database. Use this when you detect unsafe conditions, protocol violations, or regulatory non-compliance.",
-                parameters=genai.protos.Schema(
-                    type=genai.protos.Type.OBJECT,
-                    properties={
-                        "severity": genai.protos.Schema(
-                            type=genai.protos.Type.STRING,
-                            description="Severity level of the deviation. Must be one of: LOW, MEDIUM, HIGH, or CRITICAL"
-                        ),
-                        "description": genai.protos.Schema(
-                            type=genai.protos.Type.STRING,
-                            description="Detailed description of the safety deviation, including what was observed and why it's a concern"
-                        ),
-                        "recommended_action": genai.protos.Schema(
-                            type=genai.protos.Type.STRING,
-                            description="Immediate corrective action required to address the deviation"
-                        )
-                    },
-                    required=["severity", "description", "recommended_action"]
-                )
-            ),
-            genai.protos.FunctionDeclaration(
-                name="search_knowledge_vault",
-                description="Queries the safety protocols and legal regulations database. Use this to look up specific procedures, standards, or regulatory requirements.",
-                parameters=genai.protos.Schema(
-                    type=genai.protos.Type.OBJECT,
-                    properties={
-                        "query": genai.protos.Schema(
-                            type=genai.protos.Type.STRING,
-                            description="The specific safety topic, procedure, or regulation to look up"
-                        )
-                    },
-                    required=["query"]
+def _build_aegis_tools():
+    import google.generativeai as genai
+
+    return [
+        genai.protos.Tool(
+            function_declarations=[
+                genai.protos.FunctionDeclaration(
+                    name="log_deviation",
+                    description="Logs a detected safety deviation or regulatory non-conformance to the database. Use this when you detect unsafe conditions, protocol violations, or regulatory non-compliance.",
+                    parameters=genai.protos.Schema(
+                        type=genai.protos.Type.OBJECT,
+                        properties={
+                            "severity": genai.protos.Schema(
+                                type=genai.protos.Type.STRING,
+                                description="Severity level of the deviation. Must be one of: LOW, MEDIUM, HIGH, or CRITICAL"
+                            ),
+                            "description": genai.protos.Schema(
+                                type=genai.protos.Type.STRING,
+                                description="Detailed description of the safety deviation, including what was observed and why it's a concern"
+                            ),
+                            "recommended_action": genai.protos.Schema(
+                                type=genai.protos.Type.STRING,
+                                description="Immediate corrective action required to address the deviation"
+                            )
+                        },
+                        required=["severity", "description", "recommended_action"]
+                    )
+                ),
+                genai.protos.FunctionDeclaration(
+                    name="search_knowledge_vault",
+                    description="Queries the safety protocols and legal regulations database. Use this to look up specific procedures, standards, or regulatory requirements.",
+                    parameters=genai.protos.Schema(
+                        type=genai.protos.Type.OBJECT,
+                        properties={
+                            "query": genai.protos.Schema(
+                                type=genai.protos.Type.STRING,
+                                description="The specific safety topic, procedure, or regulation to look up"
+                            )
+                        },
+                        required=["query"]
+                    )
                 )
-            )
-        ]
-    )
-]
+            ]
+        )
+    ]
+
+_aegis_tools = None
+_aegis_tools_lock = threading.Lock()
+
+def get_aegis_tools():
+    """
+    Gemini function declarations for the auditor tools, built on first use
+    so importing this module does not load the SDK.
+    """
+    global _aegis_tools
+    if _aegis_tools is None:
+        with _aegis_tools_lock:
+            if _aegis_tools is None:
+                _aegis_tools = _build_aegis_tools()
+    return _aegis_tools
+
+def __getattr__(name):
+    # Keeps `from .tools import AEGIS_TOOLS` working without an eager SDK import.
+    if name == "AEGIS_TOOLS":
+        return get_aegis_tools()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
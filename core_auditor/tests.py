@@ -1,3 +1,538 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .services.history import MEDIA_PLACEHOLDER
+
+# Seconds allowed for importing the ASGI application (routing, consumers,
+# orchestrator and tools) once Django is set up.
+IMPORT_BUDGET_SECONDS = 0.5
+
+# Modules that must only load on first real use, never at worker start.
+LAZY_MODULES = ["google.generativeai", "google.cloud.bigquery"]
+
+IMPORT_PROBE = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'aegis_core.settings')
+import django
+django.setup()
+started = time.perf_counter()
+import aegis_core.asgi
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+"""
+
+class ImportBudgetTests(SimpleTestCase):
+    def _probe(self):
+        env = dict(os.environ, GEMINI_API_KEY="")
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE % (LAZY_MODULES,)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_asgi_import_skips_model_sdk(self):
+        self.assertEqual(self._probe()["loaded"], [])
+
+    def test_asgi_import_within_budget(self):
+        # Best of three to keep a cold disk cache from failing the check.
+        seconds = min(self._probe()["seconds"] for _ in range(3))
+        self.assertLess(seconds, IMPORT_BUDGET_SECONDS)
+
+class _FakeGemini:
+    def __init__(self, history):
+        self.history = history
+
+    def is_enabled(self):
+        return True
+
+    def get_history(self):
+        return self.history
+
+    def set_history(self, history):
+        self.history = history
+
+@override_settings(GEMINI_API_KEY="")
+class MediaHistoryTests(SimpleTestCase):
+    def _compact(self, part, prompt="Camera frame from stream cam1."):
+        from .services.orchestrator import AuditorOrchestrator
+
+        orchestrator = AuditorOrchestrator(session_id="media")
+        orchestrator.gemini = _FakeGemini([
+            {"role": "user", "parts": [prompt, part]},
+            {"role": "model", "parts": ["No deviations observed."]},
+        ])
+        orchestrator._compact_history()
+        return orchestrator.gemini.history
+
+    def test_frames_do_not_survive_their_turn(self):
+        history = self._compact({"mime_type": "image/png", "data": b"\x89PNG" + b"\0" * 4096})
+        self.assertEqual(history[0]["parts"], ["Camera frame from stream cam1.", MEDIA_PLACEHOLDER])
+        self.assertEqual(history[1]["parts"], ["No deviations observed."])
+
+    def test_audio_segments_do_not_survive_their_turn(self):
+        from .services.audio import segment_part
+        import numpy as np
+
+        # A full 15 s segment: ~480 KB of WAV that would otherwise be resent every turn.
+        part = segment_part(np.zeros(15 * 16000, dtype=np.int16), 16000)
+        history = self._compact(part, prompt="Audio segment from stream mic.")
+        self.assertEqual(history[0]["parts"], ["Audio segment from stream mic.", MEDIA_PLACEHOLDER])
+
+@override_settings(GEMINI_API_KEY="", AEGIS_RESPONSE_CACHE=True, AEGIS_RESPONSE_CACHE_SCOPE="session")
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        from .services.response_cache import response_cache
+
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+    async def _respond(self, orchestrator, message):
+        events = [event async for event in orchestrator.arespond(message)]
+        return events[-1][1]
+
+    async def test_repeated_input_in_session_is_served_from_cache(self):
+        from .services.orchestrator import AuditorOrchestrator
+
+        orchestrator = AuditorOrchestrator(session_id="repeat")
+        with mock.patch.object(orchestrator, "_simulate_response", wraps=orchestrator._simulate_response) as model:
+            results = [await self._respond(orchestrator, "Vitals stable,  counting sponges.") for _ in range(5)]
+            await self._respond(orchestrator, "vitals stable, counting sponges.")
+
+        self.assertEqual(model.call_count, 1)
+        self.assertEqual({result["content"] for result in results}, {results[0]["content"]})
+
+    async def test_deviation_turns_and_other_sessions_miss(self):
+        from .services.orchestrator import AuditorOrchestrator
+
+        first, second = AuditorOrchestrator(session_id="a"), AuditorOrchestrator(session_id="b")
+        with mock.patch("core_auditor.services.orchestrator.alog_deviation") as log, \
+                mock.patch.object(second, "_simulate_response", wraps=second._simulate_response) as model:
+            log.return_value = {"status": "success", "id": "1", "timestamp": "2026-01-01T00:00:00"}
+            for _ in range(2):
+                await self._respond(first, "This technique is unsafe.")
+            await self._respond(first, "Counting sponges.")
+            await self._respond(second, "Counting sponges.")
+
+        self.assertEqual(log.call_count, 2)
+        self.assertEqual(model.call_count, 1)
+
+class MessageBatcherTests(SimpleTestCase):
+    def _batcher(self):
+        from .websockets.batching import MessageBatcher
+
+        async def flush(batch):
+            pass
+
+        return MessageBatcher(flush, window=10.0, urgent=["fire", "code blue"])
+
+    def test_urgent_keywords_match_whole_words(self):
+        batcher = self._batcher()
+        self.assertTrue(batcher.is_urgent("Smoke, possible FIRE in OR 3"))
+        self.assertTrue(batcher.is_urgent("Call a code  blue now"))
+        self.assertFalse(batcher.is_urgent("Firefly lamp is on"))
+        self.assertFalse(batcher.is_urgent("Cautery backfired once"))
+
+    async def test_close_hands_back_pending_messages(self):
+        batcher = self._batcher()
+        await batcher.add({'message': "Starting closure."})
+        await batcher.add({'message': "Sponge count is off."})
+        self.assertEqual([payload['message'] for payload in batcher.close()],
+                         ["Starting closure.", "Sponge count is off."])
+        self.assertEqual(batcher.close(), [])
+
+@override_settings(GEMINI_API_KEY="", AEGIS_TOOL_TIMEOUT=0.01)
+class ToolTimeoutTests(SimpleTestCase):
+    async def test_slow_deviation_write_is_pending_not_failed(self):
+        from .services.orchestrator import AuditorOrchestrator
+
+        written = []
+
+        async def slow_write(**fields):
+            await asyncio.sleep(0.05)
+            written.append(fields)
+            return {"status": "success", "id": "1", "timestamp": "2026-01-01T00:00:00"}
+
+        orchestrator = AuditorOrchestrator(session_id="slow")
+        call = {"name": "log_deviation", "args": {
+            "severity": "HIGH", "description": "Unsafe scalpel pass", "recommended_action": "Use the neutral zone"
+        }}
+        with mock.patch("core_auditor.services.orchestrator.alog_deviation", slow_write):
+            outcome = await orchestrator._arun_tool_call(call)
+            self.assertEqual(outcome["response"]["status"], "pending")
+            self.assertIn("write in progress", outcome["display"])
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(len(written), 1)
+
+    async def test_failed_pending_write_is_reported(self):
+        from .services.orchestrator import AuditorOrchestrator
+
+        async def failing_write(**fields):
+            await asyncio.sleep(0.05)
+            raise RuntimeError("database is locked")
+
+        failures = []
+
+        async def on_failed(args, error):
+            failures.append((args["description"], error))
+
+        orchestrator = AuditorOrchestrator(session_id="slow")
+        orchestrator.on_deviation_failed = on_failed
+        call = {"name": "log_deviation", "args": {
+            "severity": "HIGH", "description": "Unsafe scalpel pass", "recommended_action": "Use the neutral zone"
+        }}
+        with mock.patch("core_auditor.services.orchestrator.alog_deviation", failing_write):
+            outcome = await orchestrator._arun_tool_call(call)
+            self.assertEqual(outcome["response"]["status"], "pending")
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(failures, [("Unsafe scalpel pass", "database is locked")])
+
+class _FailingChat(_FakeGemini):
+    """
+    Records turns like the SDK chat: the first send returns a function
+    call, the follow-up carrying the function response fails.
+    """
+
+    def __init__(self, history):
+        super().__init__(history)
+        self.sends = 0
+
+    async def send_message_async(self, message, stream=False, tool_config=None):
+        import google.generativeai as genai
+
+        self.sends += 1
+        if self.sends > 1:
+            raise RuntimeError("503 model overloaded")
+        call = genai.protos.Content(role="model", parts=[genai.protos.Part(function_call=genai.protos.FunctionCall(
+            name="search_knowledge_vault", args={"query": "sharps"}
+        ))])
+        self.history = self.history + [{"role": "user", "parts": [message]}, call]
+        return genai.protos.GenerateContentResponse(candidates=[genai.protos.Candidate(content=call)])
+
+@override_settings(GEMINI_API_KEY="")
+class FailedTurnTests(SimpleTestCase):
+    async def test_failed_tool_round_rolls_history_back(self):
+        from .services.orchestrator import AuditorOrchestrator
+
+        before = [{"role": "user", "parts": ["Starting."]}, {"role": "model", "parts": ["Monitoring."]}]
+        orchestrator = AuditorOrchestrator(session_id="failing")
+        orchestrator.gemini = _FailingChat(list(before))
+        with mock.patch("core_auditor.services.orchestrator.search_knowledge_vault", return_value={"results": []}):
+            events = [event async for event in orchestrator.arespond("What is the sharps protocol?")]
+
+        self.assertTrue(events[-1][1]["error"])
+        self.assertEqual(orchestrator.gemini.sends, 2)
+        self.assertEqual(orchestrator.gemini.history, before)
+
+class RuleEngineTests(SimpleTestCase):
+    def _engine(self, *rules):
+        from .services.rules import Rule, RuleEngine
+
+        return RuleEngine(Rule(**rule) for rule in rules)
+
+    def test_anchored_regex_needs_its_anchor(self):
+        engine = self._engine(
+            {"rule_id": "count", "kind": "regex", "pattern": r"sponge (count )?off", "anchor": "count",
+             "tool": "log_deviation", "severity": "CRITICAL"}
+        )
+        self.assertEqual([m.rule.id for m in engine.match("Sponge count off by one")], ["count"])
+        self.assertEqual(engine.match("Sponge off the tray"), [])
+        self.assertEqual(engine.match("Count is fine"), [])
+
+    def test_failing_regex_is_searched_once(self):
+        engine = self._engine(
+            {"rule_id": "count", "kind": "regex", "pattern": r"sponge count is off", "anchor": "count",
+             "tool": "log_deviation", "severity": "CRITICAL"}
+        )
+        rule = engine.rules[0]
+        with mock.patch.object(rule, "regex", wraps=rule.regex) as regex:
+            self.assertEqual(engine.match("count " * 4000), [])
+        self.assertEqual(regex.search.call_count, 1)
+
+    def test_keywords_respect_word_boundaries_and_whitespace(self):
+        engine = self._engine(
+            {"rule_id": "unsafe", "kind": "keyword", "pattern": "unsafe", "tool": "log_deviation", "severity": "HIGH"},
+            {"rule_id": "site", "kind": "phrase", "pattern": "wrong site", "tool": "log_deviation",
+             "severity": "CRITICAL"}
+        )
+        self.assertEqual([m.rule.id for m in engine.match("WRONG   site, unsafe!")], ["site", "unsafe"])
+        self.assertEqual(engine.match("Unsafeness review, wrong sites list"), [])
+
+    def test_strongest_rule_wins_and_min_severity_filters(self):
+        engine = self._engine(
+            {"rule_id": "unsafe", "kind": "keyword", "pattern": "unsafe", "tool": "log_deviation", "severity": "HIGH"},
+            {"rule_id": "breach", "kind": "phrase", "pattern": "sterile field breach", "tool": "log_deviation",
+             "severity": "HIGH", "priority": 5},
+            {"rule_id": "site", "kind": "regex", "pattern": r"wrong[- ]site", "tool": "log_deviation",
+             "severity": "CRITICAL"},
+            {"rule_id": "protocol", "kind": "keyword", "pattern": "protocol", "tool": "search_knowledge_vault"}
+        )
+        text = "Unsafe: sterile field breach at the wrong-site, check protocol"
+        self.assertEqual([m.rule.id for m in engine.match(text)], ["site", "breach", "unsafe", "protocol"])
+
+        calls = engine.tool_calls(text)
+        self.assertEqual([call["name"] for _, call in calls], ["log_deviation", "search_knowledge_vault"])
+        self.assertEqual(calls[0][1]["args"]["severity"], "CRITICAL")
+        self.assertEqual(engine.tool_calls("Unsafe retraction", min_severity="CRITICAL"), [])
+
+class LogDeviationTests(TestCase):
+    async def test_unknown_severity_is_rejected_for_the_model(self):
+        from analytics.models import Deviation
+        from channels.db import database_sync_to_async
+        from .services.tools import alog_deviation
+
+        result = await alog_deviation("severe", "Guard removed", "Stop", session_id="s1")
+        self.assertEqual(result["status"], "error")
+        self.assertIn("LOW, MEDIUM, HIGH, CRITICAL", result["error"])
+        self.assertEqual(await database_sync_to_async(Deviation.objects.count)(), 0)
+
+@override_settings(GEMINI_API_KEY="")
+class AudioRateTests(SimpleTestCase):
+    def test_decode_rejects_unlisted_rates(self):
+        from .services.audio import AudioError, decode_pcm
+
+        samples, rate = decode_pcm(b"\0\0" * 160, "audio/pcm;rate=48000")
+        self.assertEqual((len(samples), rate), (160, 48000))
+        for mime in ("audio/pcm;rate=2000000000", "audio/pcm;rate=0", "audio/pcm;rate=44000"):
+            with self.assertRaises(AudioError):
+                decode_pcm(b"\0\0" * 160, mime)
+
+    async def test_oversized_rate_gets_error_frame(self):
+        from channels.testing import WebsocketCommunicator
+        from aegis_core.asgi import application
+        from .websockets.protocol import MSGPACK_SUBPROTOCOL, MsgpackCodec
+
+        codec = MsgpackCodec()
+        communicator = WebsocketCommunicator(application, "/ws/auditor/", subprotocols=[MSGPACK_SUBPROTOCOL])
+        await communicator.connect()
+        await communicator.receive_output()
+        await communicator.send_to(**codec.encode({
+            'type': 'media', 'stream_id': 'mic', 'mime': 'audio/pcm;rate=2000000000', 'data': b"\0\0" * 320
+        }))
+        output = await communicator.receive_output()
+        frame = codec.load(bytes_data=output['bytes'])
+        self.assertEqual(frame['type'], 'error')
+        self.assertIn("Unsupported sample rate", frame['message'])
+        await communicator.disconnect()
+
+class ConversationWindowTests(SimpleTestCase):
+    def _turn(self, said, answered):
+        return [{"role": "user", "parts": [said]}, {"role": "model", "parts": [answered]}]
+
+    def _window(self, **options):
+        from .services.history import ConversationWindow
+
+        return ConversationWindow(**{"max_turns": 2, "token_budget": 10000, **options})
+
+    def test_history_within_limits_is_untouched(self):
+        history = self._turn("Incision made.", "Noted.") + self._turn("Retractor placed.", "Noted.")
+        compacted, changed = self._window().compact(history)
+        self.assertFalse(changed)
+        self.assertIs(compacted, history)
+
+    def test_turns_past_max_turns_fold_into_summary(self):
+        from .services.history import SUMMARY_ACK, SUMMARY_PREFIX
+
+        window = self._window()
+        history = [content for i in range(4) for content in self._turn(f"Step {i}.", f"Ack {i}.")]
+        compacted, changed = window.compact(history)
+
+        self.assertTrue(changed)
+        self.assertEqual(window.summary_lines, ["- Observed: Step 0. | AEGIS: Ack 0.", "- Observed: Step 1. | AEGIS: Ack 1."])
+        self.assertTrue(compacted[0]["parts"][0].startswith(SUMMARY_PREFIX))
+        self.assertEqual(compacted[1]["parts"], [SUMMARY_ACK])
+        self.assertEqual(compacted[2:], history[4:])
+
+        # The summary pair is not counted as a turn when compacting again.
+        again, changed = window.compact(compacted + self._turn("Step 4.", "Ack 4."))
+        self.assertTrue(changed)
+        self.assertEqual(len(window.summary_lines), 3)
+        self.assertEqual(len(again), 2 + 4)
+
+    def test_tool_rounds_stay_with_their_turn(self):
+        window = self._window(max_turns=1)
+        tool_turn = [
+            {"role": "user", "parts": ["Passing the scalpel hand to hand."]},
+            {"role": "model", "parts": [{"function_call": {"name": "log_deviation", "args": {}}}]},
+            {"role": "user", "parts": [{"function_response": {"name": "log_deviation", "response": {}}}]},
+            {"role": "model", "parts": ["Logged a HIGH deviation."]},
+        ]
+        compacted, _ = window.compact(tool_turn + self._turn("Closing.", "Noted."))
+        self.assertEqual(window.summary_lines, [
+            "- Observed: Passing the scalpel hand to hand. | Tools: log_deviation | AEGIS: Logged a HIGH deviation."
+        ])
+        self.assertEqual(compacted[2:], self._turn("Closing.", "Noted."))
+
+    def test_token_budget_folds_recent_turns_but_keeps_the_last(self):
+        window = self._window(max_turns=10, token_budget=100, line_chars=20)
+        history = self._turn("x" * 300, "ok") + self._turn("y" * 300, "ok") + self._turn("z" * 600, "ok")
+        compacted, changed = window.compact(history)
+
+        self.assertTrue(changed)
+        self.assertEqual(len(window.summary_lines), 2)
+        self.assertTrue(window.summary_lines[0].startswith("- Observed: xxxxxxxxxxxxxxxxx..."))
+        self.assertEqual(compacted[2:], history[4:])
+
+    def test_summary_is_capped_at_summary_chars(self):
+        window = self._window(max_turns=1, summary_chars=80)
+        history = [content for i in range(6) for content in self._turn(f"Observation number {i}.", "Ack.")]
+        window.compact(history)
+        self.assertLessEqual(sum(len(line) + 1 for line in window.summary_lines), 80)
+        self.assertTrue(window.summary_lines[-1].startswith("- Observed: Observation number 4."))
+
+@override_settings(AEGIS_WS_COMPRESS_THRESHOLD=512, AEGIS_WS_MAX_FRAME_BYTES=4096)
+class WireProtocolTests(SimpleTestCase):
+    def test_negotiation_follows_client_preference(self):
+        from .websockets.protocol import (
+            JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL, JsonCodec, MsgpackCodec, negotiate
+        )
+
+        codec, accepted = negotiate([MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL])
+        self.assertIsInstance(codec, MsgpackCodec)
+        self.assertEqual(accepted, MSGPACK_SUBPROTOCOL)
+
+        codec, accepted = negotiate(["chat.v2", JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL])
+        self.assertIsInstance(codec, JsonCodec)
+        self.assertEqual(accepted, JSON_SUBPROTOCOL)
+
+        for offered in (None, [], ["chat.v2"]):
+            codec, accepted = negotiate(offered)
+            self.assertIsInstance(codec, JsonCodec)
+            self.assertIsNone(accepted)
+
+    def test_msgpack_round_trip_compresses_only_large_frames(self):
+        from .websockets.protocol import FLAG_COMPRESSED, MsgpackCodec
+
+        codec = MsgpackCodec()
+        small = {"type": "text", "message": "Incision made.", "seq": 1}
+        large = {"type": "media", "stream_id": "cam", "mime": "image/x-raw-gray", "data": b"\0" * 2048}
+
+        for message, compressed in ((small, False), (large, True)):
+            frame = codec.encode(message)["bytes_data"]
+            self.assertEqual(bool(frame[0] & FLAG_COMPRESSED), compressed)
+            self.assertEqual(codec.decode(bytes_data=frame), message)
+
+        # Incompressible payloads above the threshold are sent as-is.
+        noise = {"type": "media", "data": os.urandom(1024)}
+        frame = codec.encode(noise)["bytes_data"]
+        self.assertFalse(frame[0] & FLAG_COMPRESSED)
+        self.assertEqual(codec.decode(bytes_data=frame), noise)
+
+    def test_oversize_and_malformed_frames_are_rejected(self):
+        import zlib
+        import msgpack
+        from .websockets.protocol import FLAG_COMPRESSED, MsgpackCodec, ProtocolError
+
+        codec = MsgpackCodec()
+        oversize = msgpack.packb({"type": "media", "data": os.urandom(5000)}, use_bin_type=True)
+        # A small compressed frame that inflates past the cap (zip bomb).
+        bomb = bytes((FLAG_COMPRESSED,)) + zlib.compress(msgpack.packb({"data": b"\0" * 100000}, use_bin_type=True))
+        self.assertLess(len(bomb), 4096)
+
+        for frame in (b"\0" + oversize, bomb, b"", b"\0\xc1", bytes((FLAG_COMPRESSED,)) + b"not zlib"):
+            with self.subTest(frame=frame[:8]):
+                with self.assertRaises(ProtocolError):
+                    codec.decode(bytes_data=frame)
+        with self.assertRaises(ProtocolError):
+            codec.decode(bytes_data=b"\0" + msgpack.packb({"type": "shutdown"}))
+
+    def test_json_codec_defaults_type_and_rejects_binary(self):
+        from .websockets.protocol import JsonCodec, ProtocolError
+
+        codec = JsonCodec()
+        self.assertEqual(codec.decode(text_data='{"message": "hi"}'), {"message": "hi", "type": "text"})
+        for kwargs in ({"bytes_data": b"\0"}, {"text_data": "{not json"}, {"text_data": "[1, 2]"}):
+            with self.assertRaises(ProtocolError):
+                codec.decode(**kwargs)
+
+SNAPSHOT = {
+    "history": [{"role": "user", "parts": ["Incision made."]}, {"role": "model", "parts": ["Noted."]}],
+    "summary_lines": ["- Observed: Patient draped. | AEGIS: Noted."],
+    "thought_signature": "sim_42",
+}
+
+class _SessionStoreChecks:
+    session_id = "0123456789abcdef0123456789abcdef"
+
+    def test_round_trip_and_expiry(self):
+        store = self._store()
+        self.assertIsNone(store.load(self.session_id, 60))
+
+        store.save(self.session_id, SNAPSHOT)
+        self.assertEqual(store.load(self.session_id, 60), SNAPSHOT)
+        store.save(self.session_id, {**SNAPSHOT, "thought_signature": "sim_43"})
+        self.assertEqual(store.load(self.session_id, 60)["thought_signature"], "sim_43")
+
+        self._age(store, self.session_id, 120)
+        self.assertIsNone(store.load(self.session_id, 60))
+
+    def test_purge_removes_only_expired_snapshots(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        store = self._store()
+        fresh = "f" * 32
+        store.save(self.session_id, SNAPSHOT)
+        store.save(fresh, SNAPSHOT)
+        self._age(store, self.session_id, 120)
+
+        output = StringIO()
+        with mock.patch("core_auditor.management.commands.purge_sessions.session_store", store):
+            call_command("purge_sessions", "--max-age", "60", stdout=output)
+        self.assertIn("Deleted 1 expired session snapshots", output.getvalue())
+        self.assertIsNone(store.load(self.session_id, 3600))
+        self.assertEqual(store.load(fresh, 60), SNAPSHOT)
+
+class DatabaseSessionStoreTests(_SessionStoreChecks, TestCase):
+    def _store(self):
+        from .services.sessions import DatabaseSessionStore
+
+        return DatabaseSessionStore()
+
+    def _age(self, store, session_id, seconds):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import SessionSnapshot
+
+        SessionSnapshot.objects.filter(session_id=session_id).update(
+            updated_at=timezone.now() - timedelta(seconds=seconds)
+        )
+
+class FileSessionStoreTests(_SessionStoreChecks, SimpleTestCase):
+    def _store(self):
+        import tempfile
+        from .services.sessions import FileSessionStore
+
+        return FileSessionStore(os.path.join(tempfile.mkdtemp(), "sessions"))
+
+    def _age(self, store, session_id, seconds):
+        import time
+
+        path = store._path(session_id)
+        old = time.time() - seconds
+        os.utime(path, (old, old))
+
+@override_settings(GEMINI_API_KEY="")
+class SessionSnapshotTests(SimpleTestCase):
+    def test_orchestrator_state_survives_encoding(self):
+        from .services.orchestrator import AuditorOrchestrator
+        from .services.sessions import decode_state, encode_state
+
+        orchestrator = AuditorOrchestrator(session_id="snap")
+        orchestrator.restore(decode_state(encode_state(SNAPSHOT)))
+        orchestrator.history.append({"role": "user", "parts": [{"mime_type": "image/png", "data": b"\x89PNG"}]})
+
+        restored = AuditorOrchestrator(session_id="snap")
+        restored.restore(decode_state(encode_state(orchestrator.snapshot())))
+        self.assertEqual(restored.history[:2], SNAPSHOT["history"])
+        self.assertEqual(restored.history[2]["parts"], [MEDIA_PLACEHOLDER])
+        self.assertEqual(restored.window.summary_lines, SNAPSHOT["summary_lines"])
+        self.assertEqual(restored.thought_signature, "sim_42")
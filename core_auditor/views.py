@@ -2,5 +2,10 @@ from django.http import HttpResponse
 
 from django.shortcuts import render
 
+from .services.metrics import registry
+
 def index(request):
     return render(request, 'core_auditor/dashboard.html')
+
+def metrics(request):
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+from ..services.rules import AhoCorasick, at_word_boundary
+
+logger = logging.getLogger(__name__)
+
+class MessageBatcher:
+    """
+    Per-session coalescing window for text messages.
+
+    Each message restarts a `window` second timer; when it fires, every
+    message received so far is handed to `flush` as one batch. A batch is
+    flushed early once it holds `max_messages`, and never waits more than
+    `max_delay` seconds after its first message. A message containing one
+    of the `urgent` keywords as a whole word or phrase (case-insensitive,
+    so "fire" does not match "firefly") flushes immediately, together with
+    anything already pending so ordering is kept.
+    """
+
+    def __init__(self, flush, window, max_messages=10, max_delay=1.0, urgent=()):
+        self._flush = flush
+        self.window = window
+        self.max_messages = max_messages
+        self.max_delay = max_delay
+        keywords = [" ".join(keyword.lower().split()) for keyword in urgent if keyword.strip()]
+        self._urgent = AhoCorasick((keyword, keyword) for keyword in keywords) if keywords else None
+        self._pending = []
+        self._first_at = None
+        self._timer = None
+
+    def is_urgent(self, message):
+        if self._urgent is None:
+            return False
+        text = " ".join(message.lower().split())
+        return any(at_word_boundary(text, start, end) for _, start, end in self._urgent.iter(text))
+
+    async def add(self, payload):
+        loop = asyncio.get_running_loop()
+        self._pending.append(payload)
+
+        if self.is_urgent(payload['message']) or len(self._pending) >= self.max_messages:
+            await self.flush()
+            return
+
+        now = loop.time()
+        if self._first_at is None:
+            self._first_at = now
+        delay = max(0.0, min(self.window, self._first_at + self.max_delay - now))
+
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.create_task(self._flush_later(delay))
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._first_at = self._pending, [], None
+        if batch:
+            await self._flush(batch)
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        # Detach before flushing so a message arriving mid-turn starts a
+        # new window instead of cancelling the turn in progress.
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing message batch: {e}")
+
+    def close(self):
+        """
+        Stops the timer and returns the messages that never got a turn, so
+        the caller can still screen them.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._first_at = self._pending, [], None
+        return pending
@@ -1,7 +1,23 @@
-import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+import asyncio
+import uuid
+from urllib.parse import parse_qs
 from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+from analytics.feed import DEVIATION_GROUP
+from analytics.pipeline import analytics_pipeline
+from ..services.audio import AudioError, VoiceSegmenter, decode_pcm, feed_chunk, is_audio
+from ..services.media import FORWARDED, FrameGate, MediaError, fingerprint, frame_part, is_image
+from ..services.metrics import (
+    ACTIVE_SESSIONS, AUDIO_SECONDS, BATCH_MESSAGES, MEDIA_FRAMES, SESSION_RESUMES, TURN_SECONDS, TURNS,
+    span, trace_turn
+)
 from ..services.orchestrator import AuditorOrchestrator
+from ..services.sessions import is_session_id, session_store
+from .batching import MessageBatcher
+from .protocol import JsonCodec, ProtocolError, negotiate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,75 +26,364 @@ class AuditorConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.orchestrator = None
+        self.session_id = uuid.uuid4().hex
+        self.counted = False
+        self.subscribed = False
+        self.codec = JsonCodec()
+        self.frame_gate = FrameGate(
+            max_fps=settings.AEGIS_MEDIA_MAX_FPS,
+            min_distance=settings.AEGIS_MEDIA_HASH_DISTANCE
+        )
+        self.audio_streams = {}
+        # Batched turns run from timer tasks, so turns are serialized here
+        # rather than by the consumer's one-message-at-a-time dispatch.
+        self.turn_lock = asyncio.Lock()
+        self.batcher = None
+        if settings.AEGIS_BATCH_WINDOW_MS > 0:
+            self.batcher = MessageBatcher(
+                self._audit_batch,
+                window=settings.AEGIS_BATCH_WINDOW_MS / 1000,
+                max_messages=settings.AEGIS_BATCH_MAX_MESSAGES,
+                max_delay=settings.AEGIS_BATCH_MAX_DELAY_MS / 1000,
+                urgent=settings.AEGIS_URGENT_KEYWORDS
+            )
 
     async def connect(self):
         try:
+            resumed = False
             if self.orchestrator is None:
-                self.orchestrator = await sync_to_async(AuditorOrchestrator)()
+                state = await self._load_session()
+                if state is not None:
+                    self.session_id = self._requested_session()
+                # The first Gemini-mode orchestrator on a worker imports the SDK
+                # and builds the shared model; keep that off the event loop.
+                self.orchestrator = await sync_to_async(AuditorOrchestrator, thread_sensitive=False)(
+                    session_id=self.session_id
+                )
+                self.orchestrator.on_deviation_failed = self._deviation_failed
+                if state is not None:
+                    self.orchestrator.restore(state)
+                    resumed = True
             
-            await self.accept()
+            self.codec, subprotocol = negotiate(self.scope.get("subprotocols"))
+            await self.accept(subprotocol=subprotocol)
+            ACTIVE_SESSIONS.inc()
+            self.counted = True
+            # Only dashboards ask for the deviation broadcast; audit clients
+            # would otherwise each receive every session's deviations.
+            if self.channel_layer is not None and "deviations" in self._query_list("subscribe"):
+                await self.channel_layer.group_add(DEVIATION_GROUP, self.channel_name)
+                self.subscribed = True
             
             gemini_status = "Gemini AI Active" if self.orchestrator.gemini.is_enabled() else "Simulation Mode"
             
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'connection_established',
-                'message': f'Aegis Core Auditor Connected - {gemini_status}'
-            }))
+                'message': f'Aegis Core Auditor Connected - {gemini_status}',
+                'protocol': self.codec.subprotocol,
+                'session_id': self.session_id,
+                'resumed': resumed
+            })
             logger.info(f"WebSocket connected: {gemini_status}")
+            self._record_event("connect", mode="gemini" if self.orchestrator.gemini.is_enabled() else "simulation", resumed=resumed)
         except Exception as e:
             logger.error(f"Error during WebSocket connection: {e}")
             import traceback
             traceback.print_exc()
             await self.accept()
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Connection error: {str(e)}'
-            }))
+            })
 
     async def disconnect(self, close_code):
         logger.info(f"WebSocket disconnected: {close_code}")
+        if self.batcher is not None:
+            pending = self.batcher.close()
+            if pending and self.orchestrator is not None:
+                await self._screen_unanswered(pending)
+        if self.counted:
+            ACTIVE_SESSIONS.dec()
+            self.counted = False
+        if self.subscribed:
+            await self.channel_layer.group_discard(DEVIATION_GROUP, self.channel_name)
+            self.subscribed = False
+        self._record_event("disconnect", close_code=close_code)
 
-    async def receive(self, text_data):
+    async def send_message(self, message):
+        await self.send(**self.codec.encode(message))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        with trace_turn() as trace:
+            await self._receive(text_data, bytes_data, trace)
+
+    async def _receive(self, text_data, bytes_data, trace):
         try:
-            text_data_json = json.loads(text_data)
-            message = text_data_json.get('message')
+            with span("receive"):
+                try:
+                    payload = self.codec.decode(text_data=text_data, bytes_data=bytes_data)
+                except ProtocolError as e:
+                    await self.send_message({'type': 'error', 'message': f'❌ Protocol error: {e}'})
+                    return
+            
+            if payload['type'] == 'ack':
+                return
+            if 'seq' in payload:
+                await self.send_message({'type': 'ack', 'seq': payload['seq']})
+            if payload['type'] == 'media':
+                await self._handle_media(payload, trace)
+                return
             
+            message = payload.get('message')
             if not message:
                 return
 
             logger.info(f"Received message: {message}")
 
-            response = await sync_to_async(self.orchestrator.process_input)(message)
-            
-            logger.info(f"Response from orchestrator: content={bool(response.get('content'))}, tool_use={bool(response.get('tool_use'))}")
-            
-            if response.get("tool_use"):
-                tool_name = response["tool_use"]["name"]
-                tool_args = response["tool_use"]["args"]
-                logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-                
-                tool_result = await sync_to_async(self.orchestrator.execute_tool)(
-                    tool_name,
-                    tool_args
-                )
-                final_message = f"{response['content']}\n\n{tool_result}"
-                logger.info(f"Tool {tool_name} executed successfully")
-            else:
-                final_message = response['content']
+            if self.batcher is not None:
+                await self.batcher.add(payload)
+                return
 
-            await self.send(text_data=json.dumps({
-                'type': 'audit_response',
-                'message': final_message,
-                'thought_signature': response.get('thought_signature')
-            }))
-            
-            logger.info(f"Sent response to client ({len(final_message)} chars)")
+            await self._audit(message, payload.get('stream', settings.AEGIS_STREAM_RESPONSES), trace)
             
         except Exception as e:
             logger.error(f"Error in WebSocket receive: {e}")
             import traceback
             traceback.print_exc()
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'❌ Error: {str(e)}'
-            }))
+            })
+
+    async def _deviation_failed(self, args, error):
+        # The model was told this write was pending; tell the client it
+        # never landed.
+        try:
+            await self.send_message({
+                'type': 'deviation_failed',
+                'severity': args.get('severity'),
+                'description': args.get('description'),
+                'message': f"❌ Deviation could not be logged: {error}"
+            })
+        except Exception as e:
+            logger.error(f"Could not report failed deviation write: {e}")
+
+    async def _screen_unanswered(self, payloads):
+        # The socket is gone so nobody sees a reply, but violations in the
+        # last batched messages must still reach the deviation log.
+        try:
+            result = await self.orchestrator.ascreen("\n".join(payload['message'] for payload in payloads))
+            logger.info(
+                f"Screened {len(payloads)} batched messages left at disconnect "
+                f"({len(result['tool_calls'])} deviations logged)"
+            )
+        except Exception as e:
+            logger.error(f"Error screening batched messages on disconnect: {e}")
+
+    async def _audit_batch(self, payloads):
+        BATCH_MESSAGES.observe(len(payloads))
+        if len(payloads) > 1:
+            logger.info(f"Coalesced {len(payloads)} messages into one turn")
+        
+        stream = any(payload.get('stream', settings.AEGIS_STREAM_RESPONSES) for payload in payloads)
+        with trace_turn() as trace:
+            try:
+                await self._audit("\n".join(payload['message'] for payload in payloads), stream, trace)
+            except Exception as e:
+                logger.error(f"Error in batched turn: {e}")
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'❌ Error: {str(e)}'
+                })
+
+    async def _audit(self, message, stream, trace, modality="text", media=None):
+        async with self.turn_lock:
+            response = await self._run_turn(message, stream, modality=modality, media=media)
+            # Taken under the lock so a queued turn cannot interleave.
+            state = self.orchestrator.snapshot() if session_store is not None else None
+        
+        logger.info(f"Response from orchestrator: content={bool(response.get('content'))}, tool_calls={len(response.get('tool_calls', []))}")
+        
+        final_message = self._compose_message(response)
+
+        with span("send"):
+            await self.send_message({
+                'type': 'audit_response',
+                'message': final_message,
+                'thought_signature': response.get('thought_signature')
+            })
+        
+        logger.info(f"Sent response to client ({len(final_message)} chars)")
+        if state is not None:
+            await self._save_session(state)
+        self._finish_turn(trace, response, stream)
+
+    def _query(self):
+        return parse_qs(self.scope.get("query_string", b"").decode("latin-1"))
+
+    def _query_list(self, name):
+        # Accepts both ?name=a,b and repeated ?name=a&name=b.
+        return [item.strip() for value in self._query().get(name, []) for item in value.split(",")]
+
+    def _requested_session(self):
+        session_id = self._query().get("session", [None])[0]
+        return session_id if is_session_id(session_id) else None
+
+    async def _load_session(self):
+        session_id = self._requested_session()
+        if session_store is None or session_id is None:
+            return None
+        
+        try:
+            with span("session_load"):
+                state = await database_sync_to_async(session_store.load)(session_id, settings.AEGIS_SESSION_TTL)
+        except Exception as e:
+            logger.error(f"Failed to load session {session_id}: {e}")
+            state = None
+        SESSION_RESUMES.inc(outcome="resumed" if state is not None else "not_found")
+        return state
+
+    async def _save_session(self, state):
+        try:
+            with span("session_save"):
+                await database_sync_to_async(session_store.save)(self.session_id, state)
+        except Exception as e:
+            logger.error(f"Failed to snapshot session {self.session_id}: {e}")
+
+    def _finish_turn(self, trace, response, stream):
+        elapsed = trace.elapsed()
+        mode = "gemini" if self.orchestrator.gemini.is_enabled() else "simulation"
+        TURNS.inc(mode=mode)
+        TURN_SECONDS.observe(elapsed, mode=mode)
+
+        if elapsed * 1000 >= settings.AEGIS_SLOW_TURN_MS:
+            logger.warning(
+                f"Slow turn ({elapsed * 1000:.0f}ms) in session {self.session_id}, "
+                f"mostly {trace.slowest()}: {trace.stages_ms()}"
+            )
+
+        self._record_event(
+            "turn",
+            latency_ms=round(elapsed * 1000, 2),
+            stages_ms=trace.stages_ms(),
+            tool_calls=len(response.get("tool_calls", [])),
+            streamed=bool(stream)
+        )
+
+    async def _handle_media(self, payload, trace):
+        data = payload.get('data')
+        stream_id = payload.get('stream_id')
+        if not isinstance(data, (bytes, bytearray)) or not stream_id:
+            await self.send_message({'type': 'error', 'message': '❌ Media chunks need stream_id and binary data'})
+            return
+        
+        mime = payload.get('mime')
+        if is_audio(mime):
+            await self._handle_audio(payload, stream_id, mime, bytes(data), trace)
+            return
+        if not is_image(mime):
+            await self.send_message({'type': 'error', 'message': f'❌ Unsupported media type: {mime}'})
+            return
+        
+        try:
+            with span("frame_decode"):
+                frame_hash, frame = await sync_to_async(fingerprint, thread_sensitive=False)(
+                    bytes(data), mime, payload.get('width'), payload.get('height'),
+                    max_side=settings.AEGIS_MEDIA_MAX_SIDE
+                )
+        except MediaError as e:
+            MEDIA_FRAMES.inc(outcome="invalid")
+            await self.send_message({'type': 'error', 'message': f'❌ Frame rejected: {e}'})
+            return
+        
+        outcome = self.frame_gate.offer(stream_id, frame_hash)
+        MEDIA_FRAMES.inc(outcome=outcome)
+        if outcome != FORWARDED:
+            logger.debug(f"Frame {stream_id}#{payload.get('seq')} {outcome} (hash {frame_hash:016x})")
+            return
+        
+        with span("frame_encode"):
+            part = await sync_to_async(frame_part, thread_sensitive=False)(frame, max_side=settings.AEGIS_MEDIA_MAX_SIDE)
+        
+        prompt = payload.get('message') or settings.AEGIS_MEDIA_FRAME_PROMPT.format(stream_id=stream_id)
+        await self._audit(
+            prompt, payload.get('stream', settings.AEGIS_STREAM_RESPONSES), trace,
+            modality="image", media=[part]
+        )
+
+    async def _handle_audio(self, payload, stream_id, mime, data, trace):
+        try:
+            samples, rate = await sync_to_async(decode_pcm, thread_sensitive=False)(
+                data, mime, default_rate=settings.AEGIS_AUDIO_SAMPLE_RATE
+            )
+        except AudioError as e:
+            await self.send_message({'type': 'error', 'message': f'❌ Audio rejected: {e}'})
+            return
+        
+        segmenter = self.audio_streams.get(stream_id)
+        if segmenter is None and len(self.audio_streams) >= settings.AEGIS_AUDIO_MAX_STREAMS:
+            await self.send_message({
+                'type': 'error',
+                'message': f'❌ Audio rejected: at most {settings.AEGIS_AUDIO_MAX_STREAMS} open audio streams per session'
+            })
+            return
+        if segmenter is None or segmenter.sample_rate != rate:
+            segmenter = self.audio_streams[stream_id] = VoiceSegmenter(
+                rate,
+                threshold_db=settings.AEGIS_AUDIO_VAD_THRESHOLD_DB,
+                hangover_ms=settings.AEGIS_AUDIO_HANGOVER_MS,
+                max_segment_seconds=settings.AEGIS_AUDIO_MAX_SEGMENT_SECONDS
+            )
+        
+        AUDIO_SECONDS.inc(len(samples) / rate, stage="received")
+        final = bool(payload.get('final'))
+        if final:
+            del self.audio_streams[stream_id]
+        with span("vad"):
+            # Messages are handled one at a time, so the segmenter is never
+            # fed from two threads at once.
+            segments = await sync_to_async(feed_chunk, thread_sensitive=False)(segmenter, samples, final)
+        
+        prompt = payload.get('message') or settings.AEGIS_AUDIO_SEGMENT_PROMPT.format(stream_id=stream_id)
+        for seconds, part in segments:
+            AUDIO_SECONDS.inc(seconds, stage="forwarded")
+            await self._audit(
+                prompt, payload.get('stream', settings.AEGIS_STREAM_RESPONSES), trace,
+                modality="audio", media=[part]
+            )
+
+    async def deviation_created(self, event):
+        await self.send_message({
+            'type': 'deviation',
+            'deviation': event['deviation']
+        })
+
+    async def _run_turn(self, message, stream, modality="text", media=None):
+        response = None
+        
+        async for kind, payload in self.orchestrator.arespond(message, modality=modality, stream=stream, media=media):
+            if kind == "delta":
+                if stream:
+                    with span("send"):
+                        await self.send_message({
+                            'type': 'audit_delta',
+                            'delta': payload
+                        })
+            else:
+                response = payload
+        
+        return response
+
+    def _compose_message(self, response):
+        if not response.get("tool_results"):
+            return response['content']
+        
+        return "\n\n".join([response['content']] + response["tool_results"])
+
+    def _record_event(self, event, **fields):
+        analytics_pipeline.enqueue("session_events", {
+            "session_id": self.session_id,
+            "event": event,
+            "timestamp": timezone.now().isoformat(),
+            **fields
+        })
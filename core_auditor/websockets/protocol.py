@@ -0,0 +1,125 @@
+"""
+Wire codecs for the auditor WebSocket.
+
+Clients pick a codec through the WebSocket subprotocol handshake:
+
+- no subprotocol or "aegis.json.v1": JSON text frames (the browser dashboard)
+- "aegis.msgpack.v1": binary frames of one flag byte followed by a
+  MessagePack map; flag bit 0 marks a zlib-compressed payload
+
+Every message is a map with a "type" key. Clients send "text" (with
+"message"), "media" (with "stream_id", "seq", "mime" and raw "data", plus
+"width" and "height" for raw camera frames and "final" on the last audio
+chunk of a stream) and may attach "seq" to any message to get an {"type": "ack"} back. Plain
+{"message": ...} JSON without a type is treated as "text".
+"""
+import json
+import zlib
+
+from django.conf import settings
+
+JSON_SUBPROTOCOL = "aegis.json.v1"
+MSGPACK_SUBPROTOCOL = "aegis.msgpack.v1"
+
+FLAG_COMPRESSED = 0x01
+
+MESSAGE_TYPES = ("text", "media", "ack")
+
+class ProtocolError(ValueError):
+    pass
+
+class JsonCodec:
+    subprotocol = JSON_SUBPROTOCOL
+
+    def encode(self, message):
+        return {"text_data": json.dumps(message)}
+
+    def decode(self, text_data=None, bytes_data=None):
+        return _normalize(self.load(text_data=text_data, bytes_data=bytes_data))
+
+    def load(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            raise ProtocolError("Binary frames need the aegis.msgpack.v1 subprotocol")
+        try:
+            return json.loads(text_data)
+        except json.JSONDecodeError as e:
+            raise ProtocolError(f"Invalid JSON frame: {e}")
+
+class MsgpackCodec:
+    """
+    MessagePack framing with per-message zlib compression for payloads of
+    at least `compress_threshold` bytes (when compression actually helps).
+    Inbound frames are capped at `max_frame_bytes` after decompression.
+    """
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def __init__(self, compress_threshold=None, max_frame_bytes=None):
+        import msgpack
+
+        self._msgpack = msgpack
+        self.compress_threshold = compress_threshold or settings.AEGIS_WS_COMPRESS_THRESHOLD
+        self.max_frame_bytes = max_frame_bytes or settings.AEGIS_WS_MAX_FRAME_BYTES
+
+    def encode(self, message):
+        payload = self._msgpack.packb(message, use_bin_type=True)
+        flags = 0
+        if len(payload) >= self.compress_threshold:
+            compressed = zlib.compress(payload, 1)
+            if len(compressed) < len(payload):
+                payload, flags = compressed, FLAG_COMPRESSED
+        return {"bytes_data": bytes((flags,)) + payload}
+
+    def decode(self, text_data=None, bytes_data=None):
+        return _normalize(self.load(text_data=text_data, bytes_data=bytes_data))
+
+    def load(self, text_data=None, bytes_data=None):
+        if bytes_data is None:
+            # Tolerate clients that fall back to JSON text on a binary session.
+            return JsonCodec().load(text_data=text_data)
+        if not bytes_data:
+            raise ProtocolError("Empty binary frame")
+
+        flags, payload = bytes_data[0], bytes_data[1:]
+        if flags & FLAG_COMPRESSED:
+            decompressor = zlib.decompressobj()
+            try:
+                payload = decompressor.decompress(payload, self.max_frame_bytes)
+            except zlib.error as e:
+                raise ProtocolError(f"Corrupt compressed frame: {e}")
+            if decompressor.unconsumed_tail:
+                raise ProtocolError(f"Frame exceeds {self.max_frame_bytes} bytes")
+        elif len(payload) > self.max_frame_bytes:
+            raise ProtocolError(f"Frame exceeds {self.max_frame_bytes} bytes")
+
+        try:
+            return self._msgpack.unpackb(payload, raw=False)
+        except Exception as e:
+            raise ProtocolError(f"Invalid MessagePack frame: {e}")
+
+def _normalize(message):
+    if not isinstance(message, dict):
+        raise ProtocolError("Frames must carry a map")
+    message.setdefault("type", "text")
+    if message["type"] not in MESSAGE_TYPES:
+        raise ProtocolError(f"Unknown message type: {message['type']}")
+    return message
+
+def msgpack_available():
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def negotiate(subprotocols):
+    """
+    Picks the codec for a connection from the client's offered
+    subprotocols, in the client's order of preference. Returns
+    (codec, subprotocol to accept or None).
+    """
+    for offered in subprotocols or []:
+        if offered == MSGPACK_SUBPROTOCOL and msgpack_available():
+            return MsgpackCodec(), MSGPACK_SUBPROTOCOL
+        if offered == JSON_SUBPROTOCOL:
+            return JsonCodec(), JSON_SUBPROTOCOL
+    return JsonCodec(), None
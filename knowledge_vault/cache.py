@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .ingest import tokenize
+
+class QueryCache:
+    """
+    Process-local LRU cache of vault search results with a TTL.
+
+    Entries are tagged with the corpus generation they were computed against;
+    a lookup against a newer generation drops the whole cache.
+    """
+
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(sorted(tokenize(query)))
+
+    def retrieve(self, vault, query, top_k=3, mode="lexical"):
+        key = (self.normalize(query), top_k, mode)
+        generation = (id(vault), getattr(vault, 'generation', 0))
+
+        results = self.get(key, generation)
+        if results is None:
+            results = vault.retrieve(query, top_k=top_k, mode=mode)
+            self.put(key, results, generation)
+        return results
+
+    def get(self, key, generation):
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self._generation = generation
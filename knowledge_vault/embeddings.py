@@ -0,0 +1,65 @@
+import zlib
+
+import numpy as np
+
+from .ingest import tokenize
+
+class HashedNgramEmbedder:
+    """
+    Offline embedder that hashes word unigrams and character trigrams into a
+    fixed-size signed feature vector. Any object with `dim` and
+    `embed(texts) -> float32 array of shape (len(texts), dim)` can replace it.
+    """
+
+    def __init__(self, dim=512, ngram=3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            buckets = self._hash_features(text)
+            if not len(buckets):
+                continue
+            signs = np.where(buckets & 1, -1.0, 1.0)
+            matrix[row] = np.bincount((buckets >> 1) % self.dim, weights=signs, minlength=self.dim)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def _hash_features(self, text):
+        features = []
+        for token in tokenize(text):
+            features.append(token)
+            padded = f"#{token}#"
+            features.extend(padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1))
+        return np.fromiter(
+            (zlib.crc32(feature.encode('utf-8')) for feature in features),
+            dtype=np.int64,
+            count=len(features),
+        )
+
+def top_k_similar(matrix, query_vector, top_k):
+    """
+    Returns (row, score) pairs for the `top_k` rows of `matrix` closest to
+    `query_vector` by dot product, using a partial sort.
+    """
+    if not len(matrix) or top_k <= 0:
+        return []
+
+    scores = matrix @ query_vector
+    if top_k < len(scores):
+        candidates = np.argpartition(scores, -top_k)[-top_k:]
+    else:
+        candidates = np.arange(len(scores))
+    ranked = candidates[np.argsort(scores[candidates])[::-1]]
+    return [(int(row), float(scores[row])) for row in ranked if scores[row] > 0]
+
+def reciprocal_rank_fusion(rankings, top_k, k=60):
+    fused = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
@@ -1,28 +1,229 @@
+import heapq
+import math
 import os
+import re
+import threading
+from collections import Counter
 
-class KnowledgeVault:
-    def __init__(self):
-        self.context_cache = []
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were will with
+""".split())
+
+def _stem(token):
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    return [_stem(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+class VaultSearchMixin:
+    """
+    Shared query path for in-memory and memory-mapped vaults.
+    """
+
+    def retrieve(self, query, top_k=3, mode="lexical"):
+        """
+        Returns the `top_k` passages for `query`. `mode` selects BM25 ranking
+        ("lexical"), embedding similarity ("dense") or a reciprocal rank
+        fusion of both ("hybrid").
+        """
+        if not len(self):
+            return []
+
+        if mode == "lexical":
+            ranking = self._lexical_ranking(query, top_k)
+        elif mode == "dense":
+            ranking = self._dense_ranking(query, top_k)
+        elif mode == "hybrid":
+            from .embeddings import reciprocal_rank_fusion
+            depth = top_k * 4
+            ranking = reciprocal_rank_fusion(
+                [self._lexical_ranking(query, depth), self._dense_ranking(query, depth)],
+                top_k
+            )
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        return [self._passage(chunk_id, score) for chunk_id, score in ranking]
+
+    def _dense_ranking(self, query, top_k):
+        from .embeddings import top_k_similar
+        query_vector = self.embedder.embed([query])[0]
+        return top_k_similar(self._embedding_matrix(), query_vector, top_k)
+
+class KnowledgeVault(VaultSearchMixin):
+    """
+    Chunked inverted index over ingested protocol documents, ranked with BM25,
+    with an optional dense embedding matrix for free-text queries.
+    """
+
+    def __init__(self, chunk_size=120, k1=1.5, b=0.75, embedder=None):
+        self.chunk_size = chunk_size
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        self.chunks = []
+        self.chunk_sources = []
+        self.chunk_lengths = []
+        self.postings = {}
+        self.total_length = 0
+        self._norms = None
+        self.generation = 0
+        self._embedder = embedder
+        self._embeddings = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from .embeddings import HashedNgramEmbedder
+            self._embedder = HashedNgramEmbedder()
+        return self._embedder
 
     def ingest_document(self, file_path):
         """
-        Simulates ingesting a PDF/Text file into the 2M token context window.
+        Reads a text file, splits it into passages and adds them to the index.
         """
         if not os.path.exists(file_path):
             return False, "File not found"
-        
-        # Simulation: Reading file and appending to "Context"
-        with open(file_path, 'r') as f:
+
+        with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
-            self.context_cache.append(content)
-        
-        print(f"Ingested {file_path}. Total Cache Size: {len(self.context_cache)} docs.")
-        return True, "Ingestion successful"
 
-    def retrieve(self, query):
+        added = self.ingest_text(content, source=os.path.basename(file_path))
+
+        print(f"Ingested {file_path}. Total Index Size: {len(self.documents)} docs, {len(self.chunks)} passages.")
+        return True, f"Ingestion successful ({added} passages)"
+
+    def ingest_directory(self, directory):
+        if not os.path.isdir(directory):
+            return 0
+
+        count = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and name.endswith(('.txt', '.md')):
+                ok, _ = self.ingest_document(path)
+                count += ok
+        return count
+
+    def ingest_text(self, content, source="inline"):
+        self.documents.append(source)
+        added = 0
+
+        for passage in self._split_passages(content):
+            terms = tokenize(passage)
+            if not terms:
+                continue
+
+            chunk_id = len(self.chunks)
+            self.chunks.append(passage)
+            self.chunk_sources.append(source)
+            self.chunk_lengths.append(len(terms))
+            self.total_length += len(terms)
+
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((chunk_id, tf))
+            added += 1
+
+        self._norms = None
+        self.generation += 1
+        return added
+
+    def _lexical_ranking(self, query, top_k):
+        n = len(self.chunks)
+        norms = self._length_norms()
+        scores = {}
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            weight = idf * (self.k1 + 1)
+            for chunk_id, tf in postings:
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight * tf / (tf + norms[chunk_id])
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def _passage(self, chunk_id, score):
+        return {"text": self.chunks[chunk_id], "source": self.chunk_sources[chunk_id], "score": score}
+
+    def _embedding_matrix(self):
+        embedded = 0 if self._embeddings is None else len(self._embeddings)
+        if embedded < len(self.chunks):
+            import numpy as np
+            rows = self.embedder.embed(self.chunks[embedded:])
+            self._embeddings = rows if self._embeddings is None else np.vstack([self._embeddings, rows])
+        return self._embeddings
+
+    def save(self, path):
         """
-        In a real 2M token window, we don't 'retrieve' in the RAG sense.
-        We just pass the whole context. 
-        But for the 'Knowledge Vault' abstraction, we might filter.
+        Writes the index to `path` in the memory-mapped format read by MappedKnowledgeVault.
         """
-        return "Full Context Retrieval Active"
+        from .storage import write_index
+        write_index(self, path)
+
+    def _length_norms(self):
+        if self._norms is None:
+            avg_length = self.total_length / len(self.chunks)
+            self._norms = [
+                self.k1 * (1 - self.b + self.b * length / avg_length)
+                for length in self.chunk_lengths
+            ]
+        return self._norms
+
+    def _split_passages(self, content):
+        for paragraph in re.split(r"\n\s*\n", content):
+            words = paragraph.split()
+            for start in range(0, len(words), self.chunk_size):
+                yield " ".join(words[start:start + self.chunk_size])
+
+_vault = None
+_vault_lock = threading.Lock()
+_query_cache = None
+
+def get_knowledge_vault():
+    """
+    Returns the process-wide vault. A prebuilt KNOWLEDGE_VAULT_INDEX file is
+    memory-mapped when present; otherwise KNOWLEDGE_VAULT_DIR is indexed on first use.
+    """
+    global _vault
+    if _vault is None:
+        with _vault_lock:
+            if _vault is None:
+                from django.conf import settings
+
+                if os.path.exists(settings.KNOWLEDGE_VAULT_INDEX):
+                    from .storage import MappedKnowledgeVault
+                    _vault = MappedKnowledgeVault(settings.KNOWLEDGE_VAULT_INDEX)
+                else:
+                    vault = KnowledgeVault()
+                    vault.ingest_directory(settings.KNOWLEDGE_VAULT_DIR)
+                    _vault = vault
+    return _vault
+
+def get_query_cache():
+    global _query_cache
+    if _query_cache is None:
+        from django.conf import settings
+        from .cache import QueryCache
+
+        _query_cache = QueryCache(
+            max_entries=settings.KNOWLEDGE_VAULT_CACHE_SIZE,
+            ttl=settings.KNOWLEDGE_VAULT_CACHE_TTL
+        )
+    return _query_cache
+
+def search_vault(query, top_k=3, mode="lexical"):
+    """
+    Searches the process-wide vault through the shared query cache.
+    """
+    return get_query_cache().retrieve(get_knowledge_vault(), query, top_k=top_k, mode=mode)
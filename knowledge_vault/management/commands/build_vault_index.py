@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from knowledge_vault.ingest import KnowledgeVault
+
+class Command(BaseCommand):
+    help = "Indexes the knowledge vault documents into a memory-mapped index file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.KNOWLEDGE_VAULT_DIR),
+                            help="Directory of .txt/.md documents to index")
+        parser.add_argument('--output', default=str(settings.KNOWLEDGE_VAULT_INDEX),
+                            help="Path of the index file to write")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        vault = KnowledgeVault()
+        count = vault.ingest_directory(options['source'])
+        vault.save(options['output'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} documents ({len(vault.chunks)} passages, {len(vault.postings)} terms) "
+            f"into {options['output']} in {elapsed:.2f}s"
+        ))
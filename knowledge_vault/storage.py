@@ -0,0 +1,207 @@
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .ingest import VaultSearchMixin, tokenize
+
+MAGIC = b"AEGISVLT"
+VERSION = 2
+
+# magic, version, byte order, n_chunks, n_terms, k1, embedding dim
+HEADER = struct.Struct("<8sIcxxxIIdIxxxx")
+SECTION = struct.Struct("<QQ")
+
+SECTIONS = (
+    "term_offsets",     # uint64[n_terms + 1] into term_bytes
+    "term_bytes",       # sorted utf-8 terms, concatenated
+    "posting_offsets",  # uint64[n_terms + 1] into postings, in entries
+    "postings",         # uint32 (chunk_id, tf) pairs
+    "chunk_norms",      # float32[n_chunks], BM25 length normalisation
+    "chunk_sources",    # uint32[n_chunks] into sources
+    "text_offsets",     # uint64[n_chunks + 1] into text_bytes
+    "text_bytes",       # utf-8 passage text, concatenated
+    "sources",          # json list of document names
+    "embeddings",       # float32[n_chunks, dim], L2-normalised
+)
+
+BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+def write_index(vault, path):
+    """
+    Serialises an in-memory KnowledgeVault to a single memory-mappable file.
+    """
+    terms = sorted(vault.postings)
+    term_offsets = array('Q', [0])
+    term_bytes = bytearray()
+    posting_offsets = array('Q', [0])
+    postings = array('I')
+
+    for term in terms:
+        term_bytes += term.encode('utf-8')
+        term_offsets.append(len(term_bytes))
+        for chunk_id, tf in vault.postings[term]:
+            postings.append(chunk_id)
+            postings.append(tf)
+        posting_offsets.append(len(postings) // 2)
+
+    sources = list(dict.fromkeys(vault.chunk_sources))
+    source_ids = {source: i for i, source in enumerate(sources)}
+
+    text_offsets = array('Q', [0])
+    text_bytes = bytearray()
+    for chunk in vault.chunks:
+        text_bytes += chunk.encode('utf-8')
+        text_offsets.append(len(text_bytes))
+
+    norms = array('f', vault._length_norms() if vault.chunks else [])
+    embeddings = vault._embedding_matrix() if vault.chunks else None
+    dim = vault.embedder.dim
+
+    payloads = [
+        term_offsets.tobytes(),
+        bytes(term_bytes),
+        posting_offsets.tobytes(),
+        postings.tobytes(),
+        norms.tobytes(),
+        array('I', [source_ids[s] for s in vault.chunk_sources]).tobytes(),
+        text_offsets.tobytes(),
+        bytes(text_bytes),
+        json.dumps(sources).encode('utf-8'),
+        embeddings.astype('float32').tobytes() if embeddings is not None else b"",
+    ]
+
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    for payload in payloads:
+        offset += -offset % 8
+        table.append((offset, len(payload)))
+        offset += len(payload)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, len(vault.chunks), len(terms), vault.k1, dim))
+        for entry in table:
+            f.write(SECTION.pack(*entry))
+        for (start, _), payload in zip(table, payloads):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, path)
+
+class MappedKnowledgeVault(VaultSearchMixin):
+    """
+    Read-only vault served straight from an index file written by write_index.
+
+    Opening only parses the header; postings and passages are read through
+    mmap on demand, so every worker shares the OS page cache for the index.
+    """
+
+    def __init__(self, path, embedder=None):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byte_order, self.n_chunks, self.n_terms, self.k1, self.dim = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported knowledge vault index: {path}")
+        if byte_order != BYTE_ORDER:
+            raise ValueError(f"Knowledge vault index byte order mismatch: {path}")
+
+        view = memoryview(self._mmap)
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            start, length = SECTION.unpack_from(self._mmap, HEADER.size + i * SECTION.size)
+            sections[name] = view[start:start + length]
+
+        self._term_offsets = sections["term_offsets"].cast('Q')
+        self._term_bytes = sections["term_bytes"]
+        self._posting_offsets = sections["posting_offsets"].cast('Q')
+        self._postings = sections["postings"].cast('I')
+        self._norms = sections["chunk_norms"].cast('f')
+        self._chunk_sources = sections["chunk_sources"].cast('I')
+        self._text_offsets = sections["text_offsets"].cast('Q')
+        self._text_bytes = sections["text_bytes"]
+        self._sources_raw = sections["sources"]
+        self._sources = None
+        self._embeddings_raw = sections["embeddings"]
+        self._embeddings = None
+        self._embedder = embedder
+
+    def __len__(self):
+        return self.n_chunks
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from .embeddings import HashedNgramEmbedder
+            self._embedder = HashedNgramEmbedder(dim=self.dim)
+        return self._embedder
+
+    @property
+    def sources(self):
+        if self._sources is None:
+            self._sources = json.loads(bytes(self._sources_raw))
+        return self._sources
+
+    def chunk_text(self, chunk_id):
+        start, end = self._text_offsets[chunk_id], self._text_offsets[chunk_id + 1]
+        return bytes(self._text_bytes[start:end]).decode('utf-8')
+
+    def _lexical_ranking(self, query, top_k):
+        n = self.n_chunks
+        norms = self._norms
+        scores = {}
+
+        for term in set(tokenize(query)):
+            index = self._find_term(term.encode('utf-8'))
+            if index is None:
+                continue
+
+            start, end = self._posting_offsets[index], self._posting_offsets[index + 1]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            weight = idf * (self.k1 + 1)
+
+            postings = self._postings[start * 2:end * 2]
+            for chunk_id, tf in zip(postings[::2], postings[1::2]):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight * tf / (tf + norms[chunk_id])
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def _passage(self, chunk_id, score):
+        return {
+            "text": self.chunk_text(chunk_id),
+            "source": self.sources[self._chunk_sources[chunk_id]],
+            "score": score,
+        }
+
+    def _embedding_matrix(self):
+        if self._embeddings is None:
+            import numpy as np
+            self._embeddings = np.frombuffer(self._embeddings_raw, dtype=np.float32).reshape(self.n_chunks, self.dim)
+        return self._embeddings
+
+    def close(self):
+        self._embeddings = None
+        for name in ("_term_offsets", "_term_bytes", "_posting_offsets", "_postings",
+                     "_norms", "_chunk_sources", "_text_offsets", "_text_bytes", "_sources_raw", "_embeddings_raw"):
+            getattr(self, name).release()
+        self._mmap.close()
+
+    def _find_term(self, term):
+        offsets = self._term_offsets
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = self._term_bytes[offsets[mid]:offsets[mid + 1]]
+            if candidate == term:
+                return mid
+            if bytes(candidate) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
@@ -1,3 +1,52 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .ingest import KnowledgeVault
+from .storage import MappedKnowledgeVault
+
+PROTOCOLS = {
+    "sharps.md": (
+        "Pass scalpels and needles through a neutral zone tray, never hand to hand.\n\n"
+        "Announce every sharp as it enters or leaves the field."
+    ),
+    "counts.md": (
+        "Count sponges, needles and instruments before incision and before closure.\n\n"
+        "A count that is off means the wound is not closed until imaging clears it."
+    ),
+    "sterile.md": "A sterile field breach requires regowning and replacing contaminated instruments.",
+}
+
+QUERIES = ["needle count before closure", "hand to hand scalpel", "regowning after breach", "unrelated words"]
+
+class MappedVaultRoundTripTests(SimpleTestCase):
+    def _round_trip(self, vault):
+        path = os.path.join(tempfile.mkdtemp(), "vault.idx")
+        vault.save(path)
+        mapped = MappedKnowledgeVault(path)
+        self.addCleanup(mapped.close)
+        return mapped
+
+    def test_index_file_ranks_like_the_in_memory_vault(self):
+        vault = KnowledgeVault(chunk_size=12)
+        for source, text in PROTOCOLS.items():
+            vault.ingest_text(text, source=source)
+        mapped = self._round_trip(vault)
+
+        self.assertEqual(len(mapped), len(vault))
+        for mode in ("lexical", "dense", "hybrid"):
+            for query in QUERIES:
+                with self.subTest(mode=mode, query=query):
+                    expected = vault.retrieve(query, top_k=3, mode=mode)
+                    actual = mapped.retrieve(query, top_k=3, mode=mode)
+                    self.assertEqual([(p["text"], p["source"]) for p in actual],
+                                     [(p["text"], p["source"]) for p in expected])
+                    for got, want in zip(actual, expected):
+                        self.assertAlmostEqual(got["score"], want["score"], places=4)
+
+    def test_empty_index_returns_nothing(self):
+        mapped = self._round_trip(KnowledgeVault())
+        self.assertEqual(len(mapped), 0)
+        for mode in ("lexical", "dense", "hybrid"):
+            self.assertEqual(mapped.retrieve("scalpel", mode=mode), [])
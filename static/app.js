@@ -5,40 +5,102 @@ document.addEventListener('DOMContentLoaded', function() {
     const sendBtn = document.getElementById('send-btn');
     const statusDot = document.querySelector('.pulse');
     const statusText = document.querySelector('.status-indicator span');
+    let pendingEntry = null;
+
+    const FEED_URL = '/api/analytics/deviations/feed/';
+    const CURSOR_KEY = 'aegis.deviationCursor';
+    const SESSION_KEY = 'aegis.sessionId';
+    const seenDeviations = new Set();
+    let deviationCursor = sessionStorage.getItem(CURSOR_KEY);
+    let reconnectDelay = 1000;
+    let auditSocket = null;
 
     // WebSocket Connection
-    // Note: Assuming port 8001 as per current server run, but ideally dynamic or 8000
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const auditSocket = new WebSocket(`${protocol}//${window.location.host}/ws/auditor/`);
 
-    auditSocket.onopen = function(e) {
-        console.log('Aegis Auditor Connected');
-        statusText.innerText = "ACTIVE - MONITORING";
-        statusDot.style.backgroundColor = "var(--accent-success)";
-    };
+    function connect() {
+        // Subscribe to the live deviation feed and resume the previous
+        // session (history and context) if the server still has it.
+        const sessionId = sessionStorage.getItem(SESSION_KEY);
+        let query = '?subscribe=deviations';
+        if (sessionId) {
+            query += `&session=${encodeURIComponent(sessionId)}`;
+        }
+        auditSocket = new WebSocket(`${protocol}//${window.location.host}/ws/auditor/${query}`);
 
-    auditSocket.onclose = function(e) {
-        console.error('Chat socket closed unexpectedly');
-        statusText.innerText = "OFFLINE";
-        statusDot.style.backgroundColor = "var(--accent-danger)";
-        statusDot.style.animation = "none";
-    };
+        auditSocket.onopen = function(e) {
+            console.log('Aegis Auditor Connected');
+            statusText.innerText = "ACTIVE - MONITORING";
+            statusDot.style.backgroundColor = "var(--accent-success)";
+            statusDot.style.animation = "";
+            reconnectDelay = 1000;
+            backfillDeviations();
+        };
+
+        auditSocket.onclose = function(e) {
+            console.error('Chat socket closed unexpectedly');
+            statusText.innerText = "OFFLINE";
+            statusDot.style.backgroundColor = "var(--accent-danger)";
+            statusDot.style.animation = "none";
+            setTimeout(connect, reconnectDelay);
+            reconnectDelay = Math.min(reconnectDelay * 2, 30000);
+        };
+
+        auditSocket.onmessage = function(e) {
+            const data = JSON.parse(e.data);
+            console.log("Received:", data);
+
+            if (data.type === 'connection_established' && data.session_id) {
+                sessionStorage.setItem(SESSION_KEY, data.session_id);
+            } else if (data.type === 'audit_delta') {
+                appendDelta(data.delta);
+            } else if (data.type === 'audit_response') {
+                if (pendingEntry) {
+                    pendingEntry.remove();
+                    pendingEntry = null;
+                }
+                appendLog(data.message, data.thought_signature);
+            } else if (data.type === 'deviation') {
+                appendDeviation(data.deviation);
+            } else if (data.type === 'deviation_failed') {
+                appendLog(data.message);
+            }
+        };
+    }
+
+    // Pull everything logged since the last deviation this tab has seen,
+    // one keyset page at a time.
+    async function backfillDeviations() {
+        let cursor = deviationCursor;
+        let hasMore = true;
 
-    auditSocket.onmessage = function(e) {
-        const data = JSON.parse(e.data);
-        console.log("Received:", data);
+        try {
+            while (hasMore) {
+                const url = cursor ? `${FEED_URL}?cursor=${encodeURIComponent(cursor)}` : FEED_URL;
+                const response = await fetch(url);
+                if (!response.ok) return;
 
-        if (data.type === 'audit_response') {
-            appendLog(data.message, data.thought_signature);
+                const page = await response.json();
+                page.deviations.forEach(appendDeviation);
+                hasMore = page.has_more && page.next_cursor !== cursor;
+                cursor = page.next_cursor;
+            }
+        } catch (err) {
+            console.error('Deviation backfill failed:', err);
         }
-    };
+    }
+
+    connect();
 
     function sendMessage() {
         const message = inputField.value;
         if (message.trim() === "") return;
 
+        if (auditSocket.readyState !== WebSocket.OPEN) return;
+
         auditSocket.send(JSON.stringify({
-            'message': message
+            'message': message,
+            'stream': true
         }));
         
         // Optimistic UI update (optional, but good for chat feel)
@@ -54,6 +116,19 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     };
 
+    function appendDelta(delta) {
+        if (!pendingEntry) {
+            pendingEntry = document.createElement('div');
+            pendingEntry.className = 'log-entry';
+            pendingEntry.innerHTML = `
+            <span class="log-timestamp">${new Date().toLocaleTimeString()}</span>
+            <div class="log-content"></div>
+        `;
+            logContainer.prepend(pendingEntry);
+        }
+        pendingEntry.querySelector('.log-content').textContent += delta;
+    }
+
     function appendLog(message, thoughtSignature, isUser = false) {
         const entry = document.createElement('div');
         entry.className = 'log-entry';
@@ -77,4 +152,26 @@ document.addEventListener('DOMContentLoaded', function() {
         entry.innerHTML = contentHtml;
         logContainer.prepend(entry); // Newest on top
     }
+
+    function appendDeviation(deviation) {
+        if (seenDeviations.has(deviation.id)) return;
+        seenDeviations.add(deviation.id);
+        deviationCursor = deviation.cursor;
+        sessionStorage.setItem(CURSOR_KEY, deviationCursor);
+
+        const entry = document.createElement('div');
+        entry.className = 'log-entry';
+        if (deviation.severity === 'HIGH' || deviation.severity === 'CRITICAL') {
+            entry.classList.add('high-severity');
+        }
+
+        const timestamp = new Date(deviation.timestamp).toLocaleTimeString();
+        entry.innerHTML = `
+            <span class="log-timestamp">${timestamp}</span>
+            <div class="log-content"></div>
+        `;
+        entry.querySelector('.log-content').textContent =
+            `[${deviation.severity}] ${deviation.description} -> ${deviation.recommended_action}`;
+        logContainer.prepend(entry);
+    }
 });